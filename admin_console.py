@@ -1,4 +1,5 @@
 from admin_panel import *
+from db_stats import get_db_stats, load_db_stats, format_db_stats, DB_STATS_FILE
 import json
 
 def print_menu():
@@ -11,6 +12,7 @@ def print_menu():
     print("6. Просмотреть категории компонентов")
     print("7. Просмотреть типы устройств")
     print("8. Просмотреть ценовые категории")
+    print("9. Статистика запросов к базе")
     print("0. Выход")
     return input("Выберите действие: ")
 
@@ -120,7 +122,7 @@ def update_price_category_console():
     max_price = int(input("Максимальная цена: "))
     description = input("Описание: ")
     
-    update_price_category(
+    moved = update_price_category(
         category_id=category_id,
         name=name,
         min_price=min_price,
@@ -129,6 +131,7 @@ def update_price_category_console():
     )
     
     print("\nЦеновая категория успешно обновлена")
+    print(f"Переклассифицировано сборок: {moved['pc_builds']}, компонентов: {moved['components']}")
 
 def print_components():
     print("\n=== Список компонентов ===")
@@ -175,6 +178,18 @@ def print_price_categories():
     for cat in categories:
         print(f"{cat['id']}. {cat['name']} ({cat['min_price']}-{cat['max_price']} руб.) - {cat['description']}")
 
+def print_db_stats():
+    print("\n=== Статистика запросов к базе ===")
+    # Статистику бота сохраняет процесс бота, своя есть у консоли
+    bot_stats = load_db_stats()
+    if bot_stats:
+        print(f"\n--- Бот ({DB_STATS_FILE}) ---")
+        print(format_db_stats(bot_stats))
+    else:
+        print(f"\nФайл статистики бота {DB_STATS_FILE} не найден")
+    print("\n--- Админ-консоль ---")
+    print(format_db_stats(get_db_stats()))
+
 def main():
     while True:
         choice = print_menu()
@@ -195,6 +210,8 @@ def main():
             print_device_types()
         elif choice == "8":
             print_price_categories()
+        elif choice == "9":
+            print_db_stats()
         elif choice == "0":
             print("Выход из программы")
             break
@@ -1,31 +1,11 @@
-import sqlite3
 from datetime import datetime
-import json
-
-def get_db_connection():
-    """Получение соединения с базой данных"""
-    conn = sqlite3.connect('bot_database.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+from database import get_db_connection, catalog_cached, invalidates_catalog, reclassify_price_categories_in, upsert_component
 
 def add_component(name, category_id, price, price_category_id, description="", specs=None, image_url=None):
-    """Добавление нового компонента"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Преобразуем спецификации в JSON, если они переданы
-    specs_json = json.dumps(specs) if specs else None
-    
-    cursor.execute("""
-        INSERT INTO components (name, category_id, price, price_category_id, description, specs, image_url)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (name, category_id, price, price_category_id, description, specs_json, image_url))
-    
-    component_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return component_id
+    """Добавление нового компонента (существующий с тем же ключом обновляется)"""
+    return upsert_component(name, category_id, price, price_category_id, description, specs, image_url)
 
+@invalidates_catalog
 def add_build(name, device_type_id, price_category_id, description="", component_ids=None, image_url=None):
     """Добавление новой сборки"""
     conn = get_db_connection()
@@ -63,8 +43,13 @@ def add_build(name, device_type_id, price_category_id, description="", component
     conn.close()
     return build_id
 
+@invalidates_catalog
 def update_price_category(category_id, name, min_price, max_price, description):
-    """Обновление ценовой категории"""
+    """Обновление ценовой категории.
+
+    Сборки и компоненты сразу переклассифицируются по новым диапазонам в той
+    же транзакции. Возвращает {таблица: количество строк, сменивших категорию}.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     
@@ -74,12 +59,16 @@ def update_price_category(category_id, name, min_price, max_price, description):
         WHERE id = ?
     """, (name, min_price, max_price, description, category_id))
     
+    moved = reclassify_price_categories_in(conn)
+    
     conn.commit()
     conn.close()
+    return moved
 
+@catalog_cached
 def get_all_components():
     """Получение списка всех компонентов"""
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     components = conn.execute("""
         SELECT c.*, cc.name as category_name, pc.name as price_category_name 
         FROM components c
@@ -90,9 +79,10 @@ def get_all_components():
     conn.close()
     return [dict(row) for row in components]
 
+@catalog_cached
 def get_all_builds():
     """Получение списка всех сборок"""
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     builds = conn.execute("""
         SELECT b.*, dt.name as device_type_name, pc.name as price_category_name 
         FROM pc_builds b
@@ -103,23 +93,26 @@ def get_all_builds():
     conn.close()
     return [dict(row) for row in builds]
 
+@catalog_cached
 def get_component_categories():
     """Получение списка категорий компонентов"""
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     categories = conn.execute("SELECT * FROM component_categories ORDER BY name").fetchall()
     conn.close()
     return [dict(row) for row in categories]
 
+@catalog_cached
 def get_device_types():
     """Получение списка типов устройств"""
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     types = conn.execute("SELECT * FROM device_types ORDER BY name").fetchall()
     conn.close()
     return [dict(row) for row in types]
 
+@catalog_cached
 def get_price_categories():
     """Получение списка ценовых категорий"""
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     categories = conn.execute("SELECT * FROM price_categories ORDER BY min_price").fetchall()
     conn.close()
     return [dict(row) for row in categories]
@@ -152,14 +145,14 @@ if __name__ == "__main__":
     print(f"Добавлена новая сборка с ID: {new_build}")
     
     # Пример обновления ценовой категории
-    update_price_category(
+    moved = update_price_category(
         category_id=1,
         name="Бюджетный",
         min_price=0,
         max_price=40000,
         description="Недорогие решения до 40 тыс. рублей"
     )
-    print("Ценовая категория обновлена")
+    print(f"Ценовая категория обновлена, перенесено сборок: {moved['pc_builds']}, компонентов: {moved['components']}")
     
     # Вывод списков
     print("\nСписок компонентов:")
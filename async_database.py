@@ -0,0 +1,89 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+import admin_panel
+import screens
+import sessions
+
+# Количество потоков, в которых выполняются запросы к базе данных
+DB_EXECUTOR_WORKERS = int(os.environ.get("DB_EXECUTOR_WORKERS", 4))
+
+_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """Выполнение блокирующей функции работы с базой в отдельном потоке"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def _make_async(func):
+    """Создание awaitable-обертки над синхронной функцией базы данных"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_in_db_thread(func, *args, **kwargs)
+    return wrapper
+
+
+def shutdown_db_executor():
+    """Остановка потоков базы данных с ожиданием незавершенных запросов"""
+    _executor.shutdown(wait=True)
+
+
+# Пользователи
+register_user = _make_async(database.register_user)
+update_user_last_active = _make_async(database.update_user_last_active)
+flush_user_activity = _make_async(database.flush_user_activity)
+
+# Сессии навигации
+get_session = _make_async(sessions.get_session)
+update_session = _make_async(sessions.update_session)
+reset_session = _make_async(sessions.reset_session)
+flush_sessions = _make_async(sessions.flush_sessions)
+
+# Справочники
+get_device_types = _make_async(database.get_device_types)
+get_price_categories = _make_async(database.get_price_categories)
+get_component_categories = _make_async(database.get_component_categories)
+get_build_counts_by_device_type = _make_async(database.get_build_counts_by_device_type)
+get_component_counts_by_category = _make_async(database.get_component_counts_by_category)
+
+# Сборки и компоненты
+get_builds_by_type_and_price = _make_async(database.get_builds_by_type_and_price)
+get_build_details = _make_async(database.get_build_details)
+get_components_by_category = _make_async(database.get_components_by_category)
+get_components_by_category_and_price = _make_async(database.get_components_by_category_and_price)
+get_component_details = _make_async(database.get_component_details)
+get_components_page = _make_async(database.get_components_page)
+get_builds_page = _make_async(database.get_builds_page)
+get_component_specs = _make_async(database.get_component_specs)
+find_components = _make_async(database.find_components)
+get_random_build = _make_async(database.get_random_build)
+add_component = _make_async(database.add_component)
+add_build = _make_async(database.add_build)
+delete_build = _make_async(database.delete_build)
+get_all_builds = _make_async(admin_panel.get_all_builds)
+get_all_components = _make_async(admin_panel.get_all_components)
+search_catalog = _make_async(database.search_catalog)
+
+# Готовые экраны навигации
+get_device_types_screen = _make_async(screens.get_device_types_screen)
+get_price_categories_screen = _make_async(screens.get_price_categories_screen)
+get_component_categories_screen = _make_async(screens.get_component_categories_screen)
+get_builds_screen = _make_async(screens.get_builds_screen)
+get_components_screen = _make_async(screens.get_components_screen)
+
+# Сохраненные страницы
+add_page_data = _make_async(database.add_page_data)
+get_page_data = _make_async(database.get_page_data)
+get_all_page_data = _make_async(database.get_all_page_data)
+search_page_data = _make_async(database.search_page_data)
+
+# Предложения пользователей
+add_suggestion = _make_async(database.add_suggestion)
+get_user_suggestions = _make_async(database.get_user_suggestions)
+get_all_suggestions = _make_async(database.get_all_suggestions)
+update_suggestion_status = _make_async(database.update_suggestion_status)
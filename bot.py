@@ -1,19 +1,27 @@
 import logging
 import os
+import sys
 from dotenv import load_dotenv
-from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton, CallbackQuery
 from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, MessageHandler, filters, CallbackQueryHandler, ConversationHandler
-from database import (
-    get_db_connection, update_user_last_active, get_device_types,
-    get_price_categories, get_component_categories, get_build_details,
-    get_builds_by_type_and_price, get_components_by_category, get_component_details,
-    get_random_build, add_suggestion, get_user_suggestions
+from async_database import (
+    register_user, update_user_last_active,
+    get_build_details, get_component_details,
+    get_random_build, add_suggestion, get_user_suggestions,
+    search_catalog, flush_user_activity, shutdown_db_executor,
+    get_session, update_session, reset_session, flush_sessions,
+    get_device_types_screen, get_price_categories_screen, get_component_categories_screen,
+    get_builds_screen, get_components_screen
 )
+from database import check_db_settings
+from snapshot import start_snapshot_refresher, stop_snapshot_refresher
+from db_stats import StatsWriter
+from webhook_server import run_webhook
+from update_processor import ChatOrderedUpdateProcessor
+from media_cache import send_photo_cached
 import json
 import ctypes
 import random
-from admin_panel import get_all_builds, get_all_components
 import asyncio
 
 
@@ -33,9 +41,6 @@ load_dotenv()
 ) = range(9)
 
 
-user_states = {}
-
-
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO
@@ -43,31 +48,17 @@ logging.basicConfig(
 
 
 TOKEN = os.environ.get("BOT_TOKEN")
+# Режим получения обновлений: polling или webhook (также флаг --webhook)
+BOT_MODE = os.environ.get("BOT_MODE", "polling")
+# Количество результатов поиска на одной странице
+SEARCH_PAGE_SIZE = int(os.environ.get("SEARCH_PAGE_SIZE", 8))
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /start"""
     user = update.effective_user
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    existing_user = cursor.execute(
-        "SELECT * FROM users WHERE user_id = ?", 
-        (user.id,)
-    ).fetchone()
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    if not existing_user:
-        cursor.execute(
-            """
-            INSERT INTO users (user_id, username, first_name, last_name, registration_date, last_active)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (user.id, user.username, user.first_name, user.last_name, current_time, current_time)
-        )
-    else:
-        update_user_last_active(user.id)
-    conn.commit()
-    conn.close()
-    user_states[user.id] = {}
+    await register_user(user.id, user.username, user.first_name, user.last_name)
+    await reset_session(user.id)
     inline_keyboard = [
         [
             InlineKeyboardButton("🖥️ Собрать ПК", callback_data="build_pc"),
@@ -102,28 +93,9 @@ async def build_pc(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     user_id = update.effective_user.id
-    update_user_last_active(user_id)
-    device_types = get_device_types()
-    all_builds = get_all_builds()
-    # Считаем количество сборок для каждого типа
-    builds_count = {}
-    for build in all_builds:
-        builds_count[build['device_type_id']] = builds_count.get(build['device_type_id'], 0) + 1
-    keyboard = []
-    for device_type in device_types:
-        count = builds_count.get(device_type['id'], 0)
-        keyboard.append([
-            InlineKeyboardButton(
-                f"{device_type['name']} ({count})", 
-                callback_data=f"device_type_{device_type['id']}"
-            )
-        ])
-    keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main")])
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(
-        "Выберите тип устройства:",
-        reply_markup=reply_markup
-    )
+    await update_user_last_active(user_id)
+    screen = await get_device_types_screen()
+    await query.edit_message_text(screen.text, reply_markup=screen.reply_markup)
     return SELECTING_DEVICE_TYPE
 
 
@@ -132,47 +104,11 @@ async def select_price_category(update: Update, context: ContextTypes.DEFAULT_TY
     query = update.callback_query
     await query.answer()
     user_id = update.effective_user.id
-    update_user_last_active(user_id)
+    await update_user_last_active(user_id)
     device_type_id = int(query.data.split("_")[-1])
-    user_states[user_id] = {"device_type_id": device_type_id}
-    price_categories = get_price_categories()
-    # Получаем название типа устройства
-    device_types = get_device_types()
-    device_type_name = next((d['name'].lower() for d in device_types if d['id'] == device_type_id), "")
-    keyboard = []
-    for price_category in price_categories:
-        if device_type_name.startswith('офис'):
-            # Для офисного ПК только бюджетный
-            if price_category['name'].lower().startswith('бюджет'):
-                max_price = "{:,}".format(price_category["max_price"]).replace(",", " ")
-                price_text = f"{price_category['name']} (до {max_price} тыс. ₽)"
-                keyboard.append([
-                    InlineKeyboardButton(
-                        price_text, 
-                        callback_data=f"price_category_{price_category['id']}"
-                    )
-                ])
-        else:
-            # Для остальных типов (игровой) — все категории
-            if price_category['name'].lower().startswith('бюджет'):
-                max_price = "{:,}".format(price_category["max_price"]).replace(",", " ")
-                price_text = f"{price_category['name']} (до {max_price} тыс. ₽)"
-            else:
-                min_price = "{:,}".format(price_category["min_price"]).replace(",", " ")
-                max_price = "{:,}".format(price_category["max_price"]).replace(",", " ")
-                price_text = f"{price_category['name']} (от {min_price} до {max_price} ₽)"
-            keyboard.append([
-                InlineKeyboardButton(
-                    price_text, 
-                    callback_data=f"price_category_{price_category['id']}"
-                )
-            ])
-    keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back_to_device")])
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(
-        "Выберите ценовую категорию:",
-        reply_markup=reply_markup
-    )
+    await reset_session(user_id, device_type_id=device_type_id)
+    screen = await get_price_categories_screen(device_type_id)
+    await query.edit_message_text(screen.text, reply_markup=screen.reply_markup)
     return SELECTING_PRICE_CATEGORY
 
 
@@ -181,33 +117,16 @@ async def show_builds(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     user_id = update.effective_user.id
-    update_user_last_active(user_id)
+    await update_user_last_active(user_id)
     price_category_id = int(query.data.split("_")[-1])
-    user_states[user_id]["price_category_id"] = price_category_id
-    device_type_id = user_states[user_id]["device_type_id"]
-    builds = get_builds_by_type_and_price(device_type_id, price_category_id)
-    if not builds:
-        keyboard = [[InlineKeyboardButton("⬅️ Назад", callback_data="back_to_price")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text(
-            "К сожалению, сборок по заданным параметрам не найдено.",
-            reply_markup=reply_markup
-        )
-    else:
-        keyboard = []
-        for build in builds:
-            keyboard.append([
-                InlineKeyboardButton(
-                    f"{build['name']}", 
-                    callback_data=f"build_{build['id']}"
-                )
-            ])
-        keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back_to_price")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text(
-            "Доступные сборки:",
-            reply_markup=reply_markup
-        )
+    session = await get_session(user_id)
+    if "device_type_id" not in session:
+        # Сессия устарела: начинаем выбор сборки заново
+        return await build_pc(update, context)
+    device_type_id = session["device_type_id"]
+    await update_session(user_id, price_category_id=price_category_id)
+    screen = await get_builds_screen(device_type_id, price_category_id)
+    await query.edit_message_text(screen.text, reply_markup=screen.reply_markup)
     return VIEWING_BUILDS
 
 
@@ -216,9 +135,9 @@ async def show_build_details(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     await query.answer()
     user_id = update.effective_user.id
-    update_user_last_active(user_id)
+    await update_user_last_active(user_id)
     build_id = int(query.data.split("_")[-1])
-    build_details = get_build_details(build_id)
+    build_details = await get_build_details(build_id)
     if not build_details:
         await show_builds(update, context)
         return VIEWING_BUILDS
@@ -233,13 +152,16 @@ async def show_build_details(update: Update, context: ContextTypes.DEFAULT_TYPE)
         message_text += f"[Открыть сборку в магазине]({build['link']})\n"
     keyboard = [[InlineKeyboardButton("⬅️ Назад к списку", callback_data="back_to_builds")]]
     reply_markup = InlineKeyboardMarkup(keyboard)
+    sent = None
     if build["image_url"]:
-        await query.message.reply_photo(
-            photo=build["image_url"],
+        sent = await send_photo_cached(
+            query.message,
+            build["image_url"],
             caption=message_text,
             parse_mode="Markdown",
             reply_markup=reply_markup
         )
+    if sent is not None:
         await query.message.delete()
     else:
         await query.edit_message_text(
@@ -255,28 +177,9 @@ async def components_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     user_id = update.effective_user.id
-    update_user_last_active(user_id)
-    component_categories = get_component_categories()
-    all_components = get_all_components()
-    # Считаем количество комплектующих для каждой категории
-    components_count = {}
-    for comp in all_components:
-        components_count[comp['category_id']] = components_count.get(comp['category_id'], 0) + 1
-    keyboard = []
-    for category in component_categories:
-        count = components_count.get(category['id'], 0)
-        keyboard.append([
-            InlineKeyboardButton(
-                f"{category['name']} ({count})", 
-                callback_data=f"component_category_{category['id']}"
-            )
-        ])
-    keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main")])
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(
-        "Выберите категорию компонентов:",
-        reply_markup=reply_markup
-    )
+    await update_user_last_active(user_id)
+    screen = await get_component_categories_screen()
+    await query.edit_message_text(screen.text, reply_markup=screen.reply_markup)
     return SELECTING_COMPONENT_CATEGORY
 
 
@@ -285,34 +188,11 @@ async def show_components(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     user_id = update.effective_user.id
-    update_user_last_active(user_id)
+    await update_user_last_active(user_id)
     category_id = int(query.data.split("_")[-1])
-    if user_id not in user_states:
-        user_states[user_id] = {}
-    user_states[user_id]["component_category_id"] = category_id
-    components = get_components_by_category(category_id)
-    if not components:
-        keyboard = [[InlineKeyboardButton("⬅️ Назад", callback_data="back_to_categories")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text(
-            "К сожалению, компонентов в данной категории не найдено.",
-            reply_markup=reply_markup
-        )
-    else:
-        keyboard = []
-        for component in components:
-            keyboard.append([
-                InlineKeyboardButton(
-                    f"{component['name']}", 
-                    callback_data=f"component_{component['id']}"
-                )
-            ])
-        keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back_to_categories")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text(
-            "Доступные компоненты:",
-            reply_markup=reply_markup
-        )    
+    await update_session(user_id, component_category_id=category_id)
+    screen = await get_components_screen(category_id)
+    await query.edit_message_text(screen.text, reply_markup=screen.reply_markup)
     return VIEWING_COMPONENTS
 
 
@@ -321,9 +201,9 @@ async def show_component_details(update: Update, context: ContextTypes.DEFAULT_T
     query = update.callback_query
     await query.answer()
     user_id = update.effective_user.id
-    update_user_last_active(user_id)
+    await update_user_last_active(user_id)
     component_id = int(query.data.split("_")[-1])
-    component = get_component_details(component_id)
+    component = await get_component_details(component_id)
     if not component:
         await show_components(update, context)
         return VIEWING_COMPONENTS
@@ -353,13 +233,16 @@ async def show_component_details(update: Update, context: ContextTypes.DEFAULT_T
         message_text += f"[Открыть компонент в магазине]({link})\n"
     keyboard = [[InlineKeyboardButton("⬅️ Назад к списку", callback_data="back_to_components")]]
     reply_markup = InlineKeyboardMarkup(keyboard)
+    sent = None
     if component["image_url"]:
-        await query.message.reply_photo(
-            photo=component["image_url"],
+        sent = await send_photo_cached(
+            query.message,
+            component["image_url"],
             caption=message_text,
             parse_mode="Markdown",
             reply_markup=reply_markup
         )
+    if sent is not None:
         await query.message.delete()
     else:
         await query.edit_message_text(
@@ -370,6 +253,99 @@ async def show_component_details(update: Update, context: ContextTypes.DEFAULT_T
     return VIEWING_COMPONENT_DETAILS
 
 
+def _parse_page_cursor(parts):
+    """Разбор направления и ключа из окончания callback_data: (after, before)"""
+    direction, price, item_id = parts[-3], int(parts[-2]), int(parts[-1])
+    cursor = (price, item_id)
+    return (None, cursor) if direction == "p" else (cursor, None)
+
+
+async def builds_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик листания списка сборок"""
+    query = update.callback_query
+    await query.answer()
+    await update_user_last_active(update.effective_user.id)
+    parts = query.data.split("_")
+    device_type_id, price_category_id = int(parts[1]), int(parts[2])
+    after, before = _parse_page_cursor(parts)
+    screen = await get_builds_screen(device_type_id, price_category_id, after=after, before=before)
+    if screen.empty:
+        return await build_pc(update, context)
+    await query.edit_message_text(screen.text, reply_markup=screen.reply_markup)
+    return VIEWING_BUILDS
+
+
+async def components_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик листания списка компонентов"""
+    query = update.callback_query
+    await query.answer()
+    await update_user_last_active(update.effective_user.id)
+    parts = query.data.split("_")
+    category_id = int(parts[1])
+    after, before = _parse_page_cursor(parts)
+    screen = await get_components_screen(category_id, after=after, before=before)
+    if screen.empty:
+        return await components_menu(update, context)
+    await query.edit_message_text(screen.text, reply_markup=screen.reply_markup)
+    return VIEWING_COMPONENTS
+
+
+async def render_search_results(user_id, page):
+    """Формирование текста и клавиатуры страницы результатов поиска"""
+    session = await get_session(user_id)
+    query_text = session.get("search_query", "")
+    # Запрашиваем на один результат больше, чтобы понять, есть ли следующая страница
+    results = await search_catalog(query_text, limit=SEARCH_PAGE_SIZE + 1, offset=page * SEARCH_PAGE_SIZE)
+    has_next = len(results) > SEARCH_PAGE_SIZE
+    results = results[:SEARCH_PAGE_SIZE]
+    if not results:
+        return f"По запросу «{query_text}» ничего не найдено.", None
+    keyboard = []
+    for result in results:
+        icon = "🖥️" if result["kind"] == "build" else "🔧"
+        title = f"{icon} {result['name']}"
+        if result["price"]:
+            title += " ({:,} ₽)".format(result["price"]).replace(",", " ")
+        callback_data = f"build_{result['id']}" if result["kind"] == "build" else f"component_{result['id']}"
+        keyboard.append([InlineKeyboardButton(title, callback_data=callback_data)])
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"search_page_{page - 1}"))
+    if has_next:
+        navigation.append(InlineKeyboardButton("Далее ➡️", callback_data=f"search_page_{page + 1}"))
+    if navigation:
+        keyboard.append(navigation)
+    keyboard.append([InlineKeyboardButton("⬅️ Главное меню", callback_data="back_to_main")])
+    return f"Результаты поиска «{query_text}» (страница {page + 1}):", InlineKeyboardMarkup(keyboard)
+
+
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /search"""
+    user_id = update.effective_user.id
+    await update_user_last_active(user_id)
+    query_text = " ".join(context.args).strip()
+    if not query_text:
+        await update.message.reply_text(
+            "Введите запрос после команды /search.\n"
+            "Например: /search RTX 4060"
+        )
+        return
+    await update_session(user_id, search_query=query_text)
+    text, reply_markup = await render_search_results(user_id, 0)
+    await update.message.reply_text(text, reply_markup=reply_markup)
+
+
+async def search_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик переключения страниц результатов поиска"""
+    query = update.callback_query
+    await query.answer()
+    user_id = update.effective_user.id
+    await update_user_last_active(user_id)
+    page = int(query.data.split("_")[-1])
+    text, reply_markup = await render_search_results(user_id, page)
+    await query.edit_message_text(text, reply_markup=reply_markup)
+
+
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /help или кнопки Помощь"""
     if update.callback_query:
@@ -383,6 +359,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "<b>Основные команды:</b>\n"
             "/start - Запустить бота и открыть главное меню\n"
             "/help - Показать эту справку\n"
+            "/search - Найти компонент или сборку по названию\n"
             "/suggest - Отправить предложение по улучшению бота\n"
             "/my_suggestions - Показать ваши предложения\n\n"
             "<b>Как пользоваться:</b>\n"
@@ -403,6 +380,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "<b>Основные команды:</b>\n"
             "/start - Запустить бота и открыть главное меню\n"
             "/help - Показать эту справку\n"
+            "/search - Найти компонент или сборку по названию\n"
             "/suggest - Отправить предложение по улучшению бота\n"
             "/my_suggestions - Показать ваши предложения\n\n"
             "<b>Как пользоваться:</b>\n"
@@ -427,7 +405,7 @@ async def handle_suggestion(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "Например: /suggest Добавьте новые сборки для игр"
         )
         return
-    suggestion_id = add_suggestion(user.id, suggestion_text)
+    suggestion_id = await add_suggestion(user.id, suggestion_text)
     await update.message.reply_text(
         f"Ваше предложение было отправлено с ID: {suggestion_id}\n"
     )
@@ -435,7 +413,7 @@ async def handle_suggestion(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def show_my_suggestions(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    suggestions = get_user_suggestions(user.id)
+    suggestions = await get_user_suggestions(user.id)
     if not suggestions:
         await update.message.reply_text(
             "У вас пока нет предложений."
@@ -506,7 +484,7 @@ async def show_my_suggestions_menu(update: Update, context: ContextTypes.DEFAULT
     await query.answer()
     user = update.effective_user
     
-    suggestions = get_user_suggestions(user.id)
+    suggestions = await get_user_suggestions(user.id)
     if not suggestions:
         keyboard = [[InlineKeyboardButton("⬅️ Назад", callback_data="suggestions")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -547,6 +525,7 @@ async def back_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     action = query.data
     user_id = update.effective_user.id
+    session = await get_session(user_id)
     if action == "back_to_main":
         keyboard = [
             [
@@ -569,104 +548,75 @@ async def back_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif action == "back_to_device":
         return await build_pc(update, context)
     elif action == "back_to_price":
-        if user_id in user_states and "device_type_id" in user_states[user_id]:
-            device_type_id = user_states[user_id]["device_type_id"]
-            device_types = get_device_types()
-            device_type_name = next((d['name'].lower() for d in device_types if d['id'] == device_type_id), "")
-            price_categories = get_price_categories()
-            keyboard = []
-            for price_category in price_categories:
-                if device_type_name.startswith('офис'):
-                    # Для офисного ПК только бюджетный
-                    if price_category['name'].lower().startswith('бюджет'):
-                        max_price = "{:,}".format(price_category["max_price"]).replace(",", " ")
-                        price_text = f"{price_category['name']} (до {max_price} тыс. ₽)"
-                        keyboard.append([
-                            InlineKeyboardButton(
-                                price_text, 
-                                callback_data=f"price_category_{price_category['id']}"
-                            )
-                        ])
-                else:
-                    # Для остальных типов (игровой) — все категории
-                    if price_category['name'].lower().startswith('бюджет'):
-                        max_price = "{:,}".format(price_category["max_price"]).replace(",", " ")
-                        price_text = f"{price_category['name']} (до {max_price} тыс. ₽)"
-                    else:
-                        min_price = "{:,}".format(price_category["min_price"]).replace(",", " ")
-                        max_price = "{:,}".format(price_category["max_price"]).replace(",", " ")
-                        price_text = f"{price_category['name']} (от {min_price} до {max_price} ₽)"
-                    keyboard.append([
-                        InlineKeyboardButton(
-                            price_text, 
-                            callback_data=f"price_category_{price_category['id']}"
-                        )
-                    ])
-            keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back_to_device")])
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(
-                "Выберите ценовую категорию:",
-                reply_markup=reply_markup
-            )
+        if "device_type_id" in session:
+            device_type_id = session["device_type_id"]
+            screen = await get_price_categories_screen(device_type_id)
+            await query.edit_message_text(screen.text, reply_markup=screen.reply_markup)
             return SELECTING_PRICE_CATEGORY
         else:
             return await build_pc(update, context)
     elif action == "back_to_builds":
-        if user_id in user_states and "device_type_id" in user_states[user_id] and "price_category_id" in user_states[user_id]:
-            device_type_id = user_states[user_id]["device_type_id"]
-            price_category_id = user_states[user_id]["price_category_id"]
-            builds = get_builds_by_type_and_price(device_type_id, price_category_id)
-            keyboard = []
-            for build in builds:
-                keyboard.append([
-                    InlineKeyboardButton(
-                        f"{build['name']}", 
-                        callback_data=f"build_{build['id']}"
-                    )
-                ])
-            keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back_to_price")])
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(
-                "Доступные сборки:",
-                reply_markup=reply_markup
-            )
+        if "device_type_id" in session and "price_category_id" in session:
+            device_type_id = session["device_type_id"]
+            price_category_id = session["price_category_id"]
+            screen = await get_builds_screen(device_type_id, price_category_id)
+            await query.edit_message_text(screen.text, reply_markup=screen.reply_markup)
             return VIEWING_BUILDS
         else:
             return await build_pc(update, context)
     elif action == "back_to_categories":
         return await components_menu(update, context)
     elif action == "back_to_components":
-        if user_id in user_states and "component_category_id" in user_states[user_id]:
-            category_id = user_states[user_id]["component_category_id"]
-            components = get_components_by_category(category_id)
-            keyboard = []
-            for component in components:
-                keyboard.append([
-                    InlineKeyboardButton(
-                        f"{component['name']}", 
-                        callback_data=f"component_{component['id']}"
-                    )
-                ])
-            keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back_to_categories")])
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(
-                "Доступные компоненты:",
-                reply_markup=reply_markup
-            )
+        if "component_category_id" in session:
+            category_id = session["component_category_id"]
+            screen = await get_components_screen(category_id)
+            await query.edit_message_text(screen.text, reply_markup=screen.reply_markup)
             return VIEWING_COMPONENTS
         else:
             return await components_menu(update, context)
 
 
+stats_writer = StatsWriter()
+
+
+async def on_shutdown(application):
+    """Завершение фоновых задач при остановке бота"""
+    logging.info("Обработка обновлений: %s", application.update_processor.stats())
+    await flush_user_activity()
+    await flush_sessions()
+    stop_snapshot_refresher()
+    shutdown_db_executor()
+    stats_writer.stop()
+
+
 def main():
     """Запуск бота"""
-    application = ApplicationBuilder().token(TOKEN).build()
+    # Самопроверка настроек SQLite, чтобы видеть фактический профиль в логах
+    db_settings, mismatches = check_db_settings()
+    logging.info("Настройки SQLite: %s", db_settings)
+    for name, expected, actual in mismatches:
+        logging.warning("Настройка SQLite %s = %s, ожидалось %s", name, actual, expected)
+    # Статистика запросов периодически сохраняется для админ-консоли
+    stats_writer.start()
+    # При CATALOG_SNAPSHOT=1 каталог читается из неизменяемого снимка
+    snapshot_version = start_snapshot_refresher()
+    if snapshot_version is not None:
+        logging.info("Каталог читается из снимка версии %s", snapshot_version)
+    # Обновления разных чатов обрабатываются параллельно (BOT_CONCURRENCY), одного чата - по порядку
+    application = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .concurrent_updates(ChatOrderedUpdateProcessor())
+        .post_shutdown(on_shutdown)
+        .build()
+    )
     
     # Добавляем обработчики команд
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("suggest", handle_suggestion))
     application.add_handler(CommandHandler("my_suggestions", show_my_suggestions))
+    application.add_handler(CommandHandler("search", search_command))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_start_text))
     application.add_handler(CallbackQueryHandler(build_pc, pattern="^build_pc$"))
     application.add_handler(CallbackQueryHandler(components_menu, pattern="^components$"))
@@ -675,6 +625,9 @@ def main():
     application.add_handler(CallbackQueryHandler(new_suggestion_menu, pattern="^new_suggestion$"))
     application.add_handler(CallbackQueryHandler(show_my_suggestions_menu, pattern="^my_suggestions$"))
     application.add_handler(CallbackQueryHandler(back_handler, pattern="^back_to"))
+    application.add_handler(CallbackQueryHandler(search_page, pattern="^search_page_"))
+    application.add_handler(CallbackQueryHandler(builds_page, pattern="^bpage_"))
+    application.add_handler(CallbackQueryHandler(components_page, pattern="^cpage_"))
     application.add_handler(CallbackQueryHandler(select_price_category, pattern="^device_type_"))
     application.add_handler(CallbackQueryHandler(show_builds, pattern="^price_category_"))
     application.add_handler(CallbackQueryHandler(show_build_details, pattern="^build_"))
@@ -682,8 +635,12 @@ def main():
     application.add_handler(CallbackQueryHandler(show_component_details, pattern="^component_"))
     
     # Запускаем бота
-    print("Бот запущен...")
-    application.run_polling()
+    if BOT_MODE == "webhook" or "--webhook" in sys.argv:
+        print("Бот запущен в режиме вебхука...")
+        run_webhook(application)
+    else:
+        print("Бот запущен...")
+        application.run_polling()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
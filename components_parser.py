@@ -340,6 +340,7 @@ class ComponentsParser:
             
             # Сохраняем обновленные данные
             self.save_to_json()
+            self.save_price_history()
             
         except Exception as e:
             logger.error(f"Ошибка при обновлении данных: {str(e)}")
@@ -540,6 +541,16 @@ class ComponentsParser:
         except Exception as e:
             logger.error(f"Ошибка при сохранении данных: {str(e)}")
 
+    def save_price_history(self):
+        """Запись собранных цен в историю цен компонентов"""
+        # Импорт здесь: database при импорте инициализирует базу и применяет миграции
+        from database import record_scraped_prices
+        try:
+            recorded = record_scraped_prices(self.components)
+            logger.info(f"Записано изменений цен: {recorded}")
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении истории цен: {str(e)}")
+
     def main(self, category):
         """Основной метод парсинга"""
         try:
@@ -547,5 +558,6 @@ class ComponentsParser:
             self.parse_citilink_components(category)
             self.parse_mvideo_components(category)
             self.save_data()
+            self.save_price_history()
         finally:
             self.close() 
\ No newline at end of file
@@ -2,14 +2,618 @@ import sqlite3
 import json
 from datetime import datetime
 import random
+import re
+import sys
+import os
+import time
+import threading
+import atexit
+import copy
+import functools
+from collections import OrderedDict
+from contextlib import contextmanager
+from migrations import (
+    apply_migrations, check_query_plans, explain_query_plan, CATALOG_FTS_FILL_SQL,
+    component_natural_key, merge_duplicate_components, BUILD_COMPONENTS_SQL
+)
+from specs import normalize_spec_key, normalize_spec_value, refresh_component_specs
+from db_stats import query_stats, DB_STATS_ENABLED
 
 DATABASE_FILE = "bot_database.db"
 
-def get_db_connection():
-    """Получение соединения с базой данных"""
-    conn = sqlite3.connect(DATABASE_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Сколько простаивающих соединений держит пул
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+# Через сколько секунд простоя соединение проверяется перед выдачей
+DB_POOL_CHECK_INTERVAL = float(os.environ.get("DB_POOL_CHECK_INTERVAL", 30))
+# Как часто (в секундах) и при скольких пользователях сбрасывается буфер активности
+ACTIVITY_FLUSH_INTERVAL = float(os.environ.get("ACTIVITY_FLUSH_INTERVAL", 30))
+ACTIVITY_FLUSH_SIZE = int(os.environ.get("ACTIVITY_FLUSH_SIZE", 100))
+# Как часто (в секундах) кэш каталога сверяет версию каталога с базой
+CATALOG_VERSION_CHECK_INTERVAL = float(os.environ.get("CATALOG_VERSION_CHECK_INTERVAL", 1))
+# Сколько колод неповторяющихся случайных сборок хранится в памяти
+RANDOM_PICK_MAX_DECKS = int(os.environ.get("RANDOM_PICK_MAX_DECKS", 10000))
+# Сколько сборок и компонентов показывается на одной странице списка
+LIST_PAGE_SIZE = int(os.environ.get("LIST_PAGE_SIZE", 10))
+# Чтение каталога ботом из неизменяемого снимка вместо основной базы
+CATALOG_SNAPSHOT_ENABLED = os.environ.get("CATALOG_SNAPSHOT", "0") == "1"
+CATALOG_SNAPSHOT_FILE = os.environ.get("CATALOG_SNAPSHOT_FILE", "catalog_snapshot.db")
+
+# Профиль производительности SQLite, применяемый к каждому соединению пула
+DB_PROFILE = {
+    "journal_mode": os.environ.get("DB_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("DB_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.environ.get("DB_MMAP_SIZE", 256 * 1024 * 1024)),
+    # Отрицательное значение задает размер кэша в килобайтах
+    "cache_size": int(os.environ.get("DB_CACHE_SIZE", -64 * 1024)),
+    "temp_store": os.environ.get("DB_TEMP_STORE", "MEMORY"),
+    "busy_timeout": int(os.environ.get("DB_BUSY_TIMEOUT", 5000)),
+    # Проверка внешних ключей и каскадное удаление связей
+    "foreign_keys": os.environ.get("DB_FOREIGN_KEYS", "ON"),
+}
+
+
+class InstrumentedCursor:
+    """Обертка над курсором, замеряющая время запроса и число прочитанных строк.
+
+    Замер запроса завершается, когда его строки дочитаны, курсор закрыт,
+    выполнен следующий запрос или соединение возвращено в пул; запросы без
+    результата учитываются сразу.
+    """
+
+    def __init__(self, connection, cursor):
+        self._connection = connection
+        self._cursor = cursor
+        self._pending = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        result = method(*args)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if self._pending is not None:
+            self._pending[2] += elapsed_ms
+        return result
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        conn = self._connection._conn
+        starts_transaction = not conn.in_transaction
+        started = time.perf_counter()
+        self._cursor.execute(sql, parameters)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if starts_transaction and conn.in_transaction:
+            # Первый пишущий оператор транзакции ждет блокировку базы
+            query_stats.record_lock_wait(elapsed_ms)
+        self._pending = [sql, parameters, elapsed_ms, 0]
+        if self._cursor.description is None:
+            self._pending[3] = max(self._cursor.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        conn = self._connection._conn
+        starts_transaction = not conn.in_transaction
+        started = time.perf_counter()
+        self._cursor.executemany(sql, seq_of_parameters)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if starts_transaction and conn.in_transaction:
+            query_stats.record_lock_wait(elapsed_ms)
+        self._pending = [sql, None, elapsed_ms, max(self._cursor.rowcount, 0)]
+        self._finish()
+        return self
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if self._pending is not None:
+            if row is None:
+                self._finish()
+            else:
+                self._pending[3] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(self._cursor.fetchmany, size or self._cursor.arraysize)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+            if len(rows) < (size or self._cursor.arraysize):
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+            self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+    def _finish(self):
+        if self._pending is None:
+            return
+        sql, parameters, elapsed_ms, rows = self._pending
+        self._pending = None
+        self._connection.rows += rows
+        query_stats.record_query(sql, elapsed_ms, rows)
+        if query_stats.is_slow(elapsed_ms):
+            plan = []
+            if parameters is not None and _EXPLAINABLE_RE.match(sql):
+                try:
+                    plan = explain_query_plan(self._connection._conn, sql, parameters)
+                except sqlite3.Error as e:
+                    plan = [f"Не удалось получить план: {e}"]
+            query_stats.record_slow_query(self._connection.function, sql, parameters, elapsed_ms, rows, plan)
+
+
+# Запросы, для которых в журнал медленных запросов пишется EXPLAIN QUERY PLAN
+_EXPLAINABLE_RE = re.compile(r"\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+# Функции работы с пулом, которые пропускаются при поиске вызывающей функции
+_POOL_FUNCTIONS = {"acquire", "get_db_connection", "get_catalog_connection", "db_connection", "__enter__"}
+
+
+def _calling_function():
+    """Имя функции, запросившей соединение из пула (модуль.функция)"""
+    frame = sys._getframe(2)
+    while frame is not None and (
+        frame.f_code.co_name in _POOL_FUNCTIONS or frame.f_code.co_filename.endswith("contextlib.py")
+    ):
+        frame = frame.f_back
+    if frame is None:
+        return "?"
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+
+class PooledConnection:
+    """Обертка над sqlite3.Connection, которая при close() возвращает соединение в пул.
+
+    При включенной статистике (DB_STATS=1) запросы через execute, executemany
+    и cursor() замеряются, а время от получения до возврата соединения
+    учитывается за функцией, которая его запросила.
+    """
+
+    def __init__(self, pool, conn, function=None):
+        self._pool = pool
+        self._conn = conn
+        self.function = function
+        self.rows = 0
+        self._acquired_at = time.perf_counter()
+        # Выданные курсоры: недочитанные запросы (execute(...).fetchone()) учитываются при close()
+        self._cursors = []
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self):
+        if not DB_STATS_ENABLED:
+            return self._conn.cursor()
+        cursor = InstrumentedCursor(self, self._conn.cursor())
+        self._cursors.append(cursor)
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        if not DB_STATS_ENABLED:
+            return self._conn.execute(sql, parameters)
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not DB_STATS_ENABLED:
+            return self._conn.executemany(sql, seq_of_parameters)
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        if not DB_STATS_ENABLED:
+            return self._conn.commit()
+        started = time.perf_counter()
+        self._conn.commit()
+        query_stats.record_query("COMMIT", (time.perf_counter() - started) * 1000)
+
+    def close(self):
+        """Возврат соединения в пул вместо закрытия"""
+        if self._conn is not None:
+            cursors, self._cursors = self._cursors, []
+            for cursor in cursors:
+                cursor._finish()
+            conn, self._conn = self._conn, None
+            if DB_STATS_ENABLED and self.function is not None:
+                query_stats.record_function(
+                    self.function, (time.perf_counter() - self._acquired_at) * 1000, self.rows
+                )
+            self._pool.release(conn)
+
+
+class ConnectionPool:
+    """Пул постоянно открытых соединений с базой данных.
+
+    Соединения живут между запросами, поэтому функции модуля не платят за
+    открытие файла и разбор схемы при каждом вызове. Если все соединения
+    заняты, создается временное соединение, которое закрывается при возврате.
+    """
+
+    def __init__(self, database, size=DB_POOL_SIZE, check_interval=DB_POOL_CHECK_INTERVAL,
+                 readonly=False, profile=None):
+        self.database = database
+        self.readonly = readonly
+        self.profile = DB_PROFILE if profile is None else profile
+        self.size = size
+        self.check_interval = check_interval
+        self._idle = []
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        if self.readonly:
+            conn = sqlite3.connect(f"file:{self.database}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.database, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        apply_db_profile(conn, self.profile, readonly=self.readonly)
+        return conn
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """Получение соединения из пула"""
+        started = time.perf_counter()
+        conn = None
+        with self._lock:
+            if self._idle:
+                conn = self._idle.pop()
+                last_used = self._last_used.pop(id(conn), 0)
+
+        if conn is not None and time.monotonic() - last_used > self.check_interval:
+            # Давно не использовавшееся соединение проверяем перед выдачей
+            if not self._is_healthy(conn):
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+                conn = None
+        if conn is None:
+            conn = self._connect()
+        if not DB_STATS_ENABLED:
+            return PooledConnection(self, conn)
+        query_stats.record_pool_wait((time.perf_counter() - started) * 1000)
+        return PooledConnection(self, conn, _calling_function())
+
+    def release(self, conn):
+        """Возврат соединения в пул"""
+        try:
+            if conn.in_transaction:
+                # Незакоммиченные изменения отбрасываются, как при обычном close()
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        with self._lock:
+            if not self._closed and len(self._idle) < self.size:
+                self._idle.append(conn)
+                self._last_used[id(conn)] = time.monotonic()
+                return
+        conn.close()
+
+    def close_all(self):
+        """Закрытие всех простаивающих соединений"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._last_used.clear()
+        for conn in idle:
+            conn.close()
+
+
+def apply_db_profile(conn, profile, readonly=False):
+    """Применение настроек производительности к соединению"""
+    if not readonly and profile.get("journal_mode"):
+        # Режим журнала хранится в самом файле базы, читающим соединениям его не менять
+        conn.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+    for name in ("synchronous", "mmap_size", "cache_size", "temp_store", "busy_timeout", "foreign_keys"):
+        if profile.get(name) is not None:
+            conn.execute(f"PRAGMA {name} = {profile[name]}")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+
+
+class SnapshotConnection(sqlite3.Connection):
+    """Соединение со снимком каталога, помнящее, какой файл снимка и какую версию каталога оно открыло"""
+    file_id = None
+    catalog_version = None
+
+
+class SnapshotPool(ConnectionPool):
+    """Пул соединений с неизменяемым снимком каталога (immutable=1).
+
+    SQLite не проверяет блокировки и изменения такого файла, поэтому
+    чтение никогда не ждет писателей. Новый снимок публикуется заменой
+    файла через os.replace: пул замечает смену файла, закрывает соединения
+    со старым снимком, а уже выданные дочитывают его до возврата в пул.
+    """
+
+    def __init__(self, database, **kwargs):
+        super().__init__(database, readonly=True, **kwargs)
+        self._file_id = None
+
+    def _current_file_id(self):
+        try:
+            stat = os.stat(self.database)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            f"file:{self.database}?immutable=1", uri=True,
+            check_same_thread=False, factory=SnapshotConnection
+        )
+        conn.file_id = self._file_id
+        conn.row_factory = sqlite3.Row
+        apply_db_profile(conn, self.profile, readonly=True)
+        try:
+            row = conn.execute("SELECT version FROM catalog_meta WHERE id = 1").fetchone()
+            conn.catalog_version = row[0] if row else None
+        except sqlite3.OperationalError:
+            conn.catalog_version = None
+        return conn
+
+    def acquire(self):
+        """Получение соединения с актуальным снимком"""
+        file_id = self._current_file_id()
+        if file_id != self._file_id:
+            with self._lock:
+                self._file_id = file_id
+                idle, self._idle = self._idle, []
+                self._last_used.clear()
+            for conn in idle:
+                conn.close()
+        return super().acquire()
+
+    def release(self, conn):
+        """Возврат соединения; соединения со старым снимком закрываются"""
+        if conn.file_id != self._file_id:
+            conn.close()
+            return
+        super().release(conn)
+
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def get_pool(readonly=False):
+    """Получение пула соединений для текущего файла базы данных"""
+    with _pool_lock:
+        pool = _pools.get(readonly)
+        if pool is None or pool.database != DATABASE_FILE:
+            if pool is not None:
+                pool.close_all()
+            pool = _pools[readonly] = ConnectionPool(DATABASE_FILE, readonly=readonly)
+        return pool
+
+
+def get_snapshot_pool():
+    """Получение пула соединений со снимком каталога"""
+    with _pool_lock:
+        pool = _pools.get("snapshot")
+        if pool is None or pool.database != CATALOG_SNAPSHOT_FILE:
+            if pool is not None:
+                pool.close_all()
+            pool = _pools["snapshot"] = SnapshotPool(CATALOG_SNAPSHOT_FILE)
+        return pool
+
+
+def close_db_connections():
+    """Закрытие всех соединений пула (например, перед удалением файла базы)"""
+    with _pool_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
+
+
+def get_db_connection(readonly=False):
+    """Получение соединения с базой данных из пула.
+
+    readonly=True выдает соединение только для чтения, которое используется
+    на путях обслуживания пользователей бота.
+    """
+    return get_pool(readonly).acquire()
+
+
+def get_catalog_connection():
+    """Получение соединения для чтения каталога на путях обслуживания бота.
+
+    Если включен снимок каталога (CATALOG_SNAPSHOT=1), он опубликован и
+    содержит последнюю известную версию каталога, соединение открывает
+    снимок, иначе - основную базу только для чтения. Так после изменения
+    каталога чтение не попадает в кэш из устаревшего снимка до его
+    перепубликации.
+    """
+    if CATALOG_SNAPSHOT_ENABLED and os.path.exists(CATALOG_SNAPSHOT_FILE):
+        conn = get_snapshot_pool().acquire()
+        db_version = _catalog_cache.db_version
+        if db_version is not None and conn.catalog_version == db_version:
+            return conn
+        conn.close()
+    return get_db_connection(readonly=True)
+
+
+def get_db_settings(readonly=False):
+    """Получение фактических настроек SQLite у соединения из пула"""
+    conn = get_db_connection(readonly=readonly)
+    try:
+        settings = {}
+        for name in DB_PROFILE:
+            settings[name] = conn.execute(f"PRAGMA {name}").fetchone()[0]
+        return settings
+    finally:
+        conn.close()
+
+
+# Числовые значения, которые SQLite возвращает для строковых настроек
+_PRAGMA_VALUES = {
+    "synchronous": {"OFF": 0, "NORMAL": 1, "FULL": 2, "EXTRA": 3},
+    "temp_store": {"DEFAULT": 0, "FILE": 1, "MEMORY": 2},
+    "foreign_keys": {"OFF": 0, "ON": 1},
+}
+
+
+def check_db_settings():
+    """Самопроверка при запуске: фактические настройки и расхождения с профилем.
+
+    Возвращает (settings, mismatches), где mismatches - список
+    (настройка, ожидаемое значение, фактическое значение).
+    """
+    settings = get_db_settings()
+    mismatches = []
+    for name, expected in DB_PROFILE.items():
+        actual = settings.get(name)
+        if isinstance(expected, str):
+            if name in _PRAGMA_VALUES:
+                expected_value = _PRAGMA_VALUES[name].get(expected.upper(), expected)
+            else:
+                expected_value = expected.lower()
+                actual = str(actual).lower()
+        else:
+            expected_value = expected
+        if actual != expected_value:
+            mismatches.append((name, expected, settings.get(name)))
+    return settings, mismatches
+
+
+@contextmanager
+def db_connection():
+    """Контекстный менеджер для работы с соединением из пула.
+
+    При успешном выходе изменения фиксируются, при исключении откатываются.
+    """
+    conn = get_db_connection()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+class CatalogCache:
+    """Кэш чтения справочников, сборок и компонентов.
+
+    Каждая запись хранит версию каталога, с которой она была загружена.
+    Версия увеличивается при изменениях через функции этого модуля и при
+    изменении catalog_meta.version в базе (ее увеличивают триггеры, так что
+    изменения из других процессов тоже замечаются не позже чем через
+    check_interval секунд). Записи другой версии никогда не выдаются.
+    """
+
+    def __init__(self, check_interval=CATALOG_VERSION_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._entries = {}
+        self._version = 0
+        self._db_version = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def db_version(self):
+        """Последняя прочитанная из основной базы версия catalog_meta"""
+        return self._db_version
+
+    def _read_db_version(self):
+        # Версия всегда читается из основной базы: по ней проверяется актуальность снимка
+        conn = get_db_connection(readonly=True)
+        try:
+            row = conn.execute("SELECT version FROM catalog_meta WHERE id = 1").fetchone()
+        except sqlite3.OperationalError:
+            # Таблица еще не создана миграциями
+            return None
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def version(self):
+        """Текущая версия каталога с учетом изменений в базе"""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._version
+        db_version = self._read_db_version()
+        with self._lock:
+            self._checked_at = now
+            if db_version != self._db_version:
+                self._db_version = db_version
+                self._version += 1
+                self._entries.clear()
+            return self._version
+
+    def get(self, key, loader):
+        """Получение значения из кэша или его загрузка через loader"""
+        version = self.version()
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            entry = (version, loader())
+            with self._lock:
+                if version == self._version:
+                    self._entries[key] = entry
+        # Возвращаем копию, чтобы вызывающий код не испортил закэшированные данные
+        return copy.deepcopy(entry[1])
+
+    def invalidate(self):
+        """Сброс кэша после изменения каталога"""
+        with self._lock:
+            self._version += 1
+            self._checked_at = None
+            self._entries.clear()
+
+
+_catalog_cache = CatalogCache()
+
+
+def get_catalog_version():
+    """Получение текущей версии каталога"""
+    return _catalog_cache.version()
+
+
+def invalidate_catalog_cache():
+    """Сброс кэша каталога"""
+    _catalog_cache.invalidate()
+
+
+def catalog_cached(func):
+    """Декоратор: результат функции чтения каталога кэшируется до изменения каталога"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (func.__module__, func.__name__, args, tuple(sorted(kwargs.items())))
+        return _catalog_cache.get(key, lambda: func(*args, **kwargs))
+    return wrapper
+
+
+def invalidates_catalog(func):
+    """Декоратор: после выполнения функции кэш каталога сбрасывается"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            invalidate_catalog_cache()
+    return wrapper
+
 
 def init_db():
     """Инициализация базы данных и создание необходимых таблиц"""
@@ -91,15 +695,7 @@ def init_db():
     ''')
     
     # Таблица для связи сборок и компонентов (many-to-many)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS build_components (
-        id INTEGER PRIMARY KEY,
-        build_id INTEGER,
-        component_id INTEGER,
-        FOREIGN KEY (build_id) REFERENCES pc_builds (id),
-        FOREIGN KEY (component_id) REFERENCES components (id)
-    )
-    ''')
+    cursor.execute(BUILD_COMPONENTS_SQL.format(table="build_components"))
     
     # Таблица для хранения ссылок и текста страниц
     cursor.execute('''
@@ -157,6 +753,12 @@ def init_db():
         cursor.executemany("INSERT INTO component_categories (id, name, description) VALUES (?, ?, ?)", component_categories)
     
     conn.commit()
+    
+    # Применяем миграции схемы и проверяем, что индексы используются
+    apply_migrations(conn)
+    for name, plan in check_query_plans(conn):
+        print(f"Внимание: запрос {name} не использует индекс: {'; '.join(plan)}")
+    
     conn.close()
     print("База данных инициализирована: bot_database.db")
     
@@ -166,38 +768,163 @@ def init_db():
     # Исправляем ценовые категории
     fix_price_categories()
 
-def update_user_last_active(user_id):
-    """Обновление времени последней активности пользователя"""
+def register_user(user_id, username, first_name, last_name):
+    """Регистрация нового пользователя или обновление времени его активности"""
     conn = get_db_connection()
+    cursor = conn.cursor()
+    existing_user = cursor.execute(
+        "SELECT user_id FROM users WHERE user_id = ?",
+        (user_id,)
+    ).fetchone()
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn.execute("UPDATE users SET last_active = ? WHERE user_id = ?", (current_time, user_id))
+    if not existing_user:
+        cursor.execute(
+            """
+            INSERT INTO users (user_id, username, first_name, last_name, registration_date, last_active)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (user_id, username, first_name, last_name, current_time, current_time)
+        )
+    else:
+        cursor.execute("UPDATE users SET last_active = ? WHERE user_id = ?", (current_time, user_id))
     conn.commit()
     conn.close()
 
+class ActivityBuffer:
+    """Буфер времени последней активности пользователей.
+
+    Отметки накапливаются в памяти (по одной на пользователя) и записываются
+    одной транзакцией раз в flush_interval секунд или при накоплении
+    flush_size пользователей.
+    """
+
+    def __init__(self, flush_interval=ACTIVITY_FLUSH_INTERVAL, flush_size=ACTIVITY_FLUSH_SIZE):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def _schedule_flush(self):
+        """Запуск таймера записи (вызывается под self._lock)"""
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            print(f"Не удалось записать активность пользователей, повтор через {self.flush_interval} с: {e}")
+
+    def touch(self, user_id):
+        """Отметка активности пользователя"""
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._pending[user_id] = current_time
+            should_flush = len(self._pending) >= self.flush_size
+            if not should_flush:
+                self._schedule_flush()
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """Запись накопленных отметок в базу данных.
+
+        Если запись не удалась, отметки возвращаются в буфер (более новые,
+        накопленные за это время, не затираются) и запись повторяется по таймеру.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return 0
+        conn = get_db_connection()
+        try:
+            # Время активности не должно откатываться назад, если его уже обновили напрямую
+            conn.executemany(
+                "UPDATE users SET last_active = ? WHERE user_id = ? AND (last_active IS NULL OR last_active < ?)",
+                [(last_active, user_id, last_active) for user_id, last_active in pending.items()]
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            with self._lock:
+                for user_id, last_active in pending.items():
+                    if self._pending.get(user_id, "") < last_active:
+                        self._pending[user_id] = last_active
+                self._schedule_flush()
+            raise
+        finally:
+            conn.close()
+        return len(pending)
+
+
+_activity_buffer = ActivityBuffer()
+
+
+def update_user_last_active(user_id):
+    """Обновление времени последней активности пользователя (через буфер)"""
+    _activity_buffer.touch(user_id)
+
+
+def flush_user_activity():
+    """Принудительная запись накопленных отметок активности"""
+    return _activity_buffer.flush()
+
+
+atexit.register(flush_user_activity)
+
+@catalog_cached
 def get_device_types():
     """Получение всех типов устройств"""
-    conn = get_db_connection()
+    conn = get_catalog_connection()
     device_types = conn.execute("SELECT * FROM device_types").fetchall()
     conn.close()
     return [dict(row) for row in device_types]
 
+@catalog_cached
 def get_price_categories():
     """Получение всех ценовых категорий"""
-    conn = get_db_connection()
+    conn = get_catalog_connection()
     price_categories = conn.execute("SELECT * FROM price_categories").fetchall()
     conn.close()
     return [dict(row) for row in price_categories]
 
+@catalog_cached
 def get_component_categories():
     """Получение всех категорий компонентов"""
-    conn = get_db_connection()
+    conn = get_catalog_connection()
     component_categories = conn.execute("SELECT * FROM component_categories").fetchall()
     conn.close()
     return [dict(row) for row in component_categories]
 
+def _get_catalog_counts(kind):
+    conn = get_catalog_connection()
+    rows = conn.execute(
+        "SELECT key_id, count FROM catalog_counts WHERE kind = ?",
+        (kind,)
+    ).fetchall()
+    conn.close()
+    return {row["key_id"]: row["count"] for row in rows}
+
+@catalog_cached
+def get_build_counts_by_device_type():
+    """Количество сборок для каждого типа устройства: {device_type_id: count}"""
+    return _get_catalog_counts("builds_by_device_type")
+
+@catalog_cached
+def get_component_counts_by_category():
+    """Количество компонентов в каждой категории: {category_id: count}"""
+    return _get_catalog_counts("components_by_category")
+
+@catalog_cached
 def get_builds_by_type_and_price(device_type_id, price_category_id):
     """Получение сборок по типу устройства и ценовой категории"""
-    conn = get_db_connection()
+    conn = get_catalog_connection()
     builds = conn.execute("""
         SELECT * FROM pc_builds 
         WHERE device_type_id = ? AND price_category_id = ?
@@ -205,9 +932,10 @@ def get_builds_by_type_and_price(device_type_id, price_category_id):
     conn.close()
     return [dict(row) for row in builds]
 
+@catalog_cached
 def get_build_details(build_id):
     """Получение детальной информации о сборке, включая компоненты"""
-    conn = get_db_connection()
+    conn = get_catalog_connection()
     build = conn.execute("SELECT * FROM pc_builds WHERE id = ?", (build_id,)).fetchone()
     
     if not build:
@@ -228,9 +956,10 @@ def get_build_details(build_id):
         "components": [dict(component) for component in components]
     }
 
+@catalog_cached
 def get_components_by_category(category_id):
     """Получение компонентов по категории"""
-    conn = get_db_connection()
+    conn = get_catalog_connection()
     components = conn.execute("""
         SELECT * FROM components 
         WHERE category_id = ?
@@ -239,9 +968,10 @@ def get_components_by_category(category_id):
     conn.close()
     return [dict(row) for row in components]
 
+@catalog_cached
 def get_components_by_category_and_price(category_id, price_category_id):
     """Получение компонентов по категории и ценовой категории"""
-    conn = get_db_connection()
+    conn = get_catalog_connection()
     components = conn.execute("""
         SELECT * FROM components 
         WHERE category_id = ? AND price_category_id = ?
@@ -250,9 +980,79 @@ def get_components_by_category_and_price(category_id, price_category_id):
     conn.close()
     return [dict(row) for row in components]
 
+def _keyset_page(conn, table, columns, where, params, key_columns, after=None, before=None, limit=LIST_PAGE_SIZE):
+    """Страница выборки по ключу сортировки вместо OFFSET.
+
+    after - ключ последней записи предыдущей страницы (листание вперед),
+    before - ключ первой записи следующей страницы (листание назад). Запрос
+    читает не больше limit + 1 строк по индексу, сколько бы записей ни было.
+    key_columns - SQL-выражения ключа; NULL в них должен быть заменен
+    через COALESCE, иначе сравнение строк пропустит такие записи.
+    Возвращает словарь items, next и prev, где next/prev - ключи для
+    соседних страниц или None, если листать некуда.
+    """
+    key = ", ".join(key_columns)
+    placeholders = ", ".join("?" * len(key_columns))
+    key_aliases = [f"_key{index}" for index in range(len(key_columns))]
+    selected = ", ".join([columns, *(f"{column} AS {alias}" for column, alias in zip(key_columns, key_aliases))])
+    if before is not None:
+        condition, direction, cursor = f" AND ({key}) < ({placeholders})", "DESC", tuple(before)
+    elif after is not None:
+        condition, direction, cursor = f" AND ({key}) > ({placeholders})", "ASC", tuple(after)
+    else:
+        condition, direction, cursor = "", "ASC", ()
+    order = ", ".join(f"{column} {direction}" for column in key_columns)
+    rows = conn.execute(f"""
+        SELECT {selected} FROM {table}
+        WHERE {where}{condition}
+        ORDER BY {order}
+        LIMIT ?
+    """, (*params, *cursor, limit + 1)).fetchall()
+    has_more = len(rows) > limit
+    items, keys = [], []
+    for row in rows[:limit]:
+        item = dict(row)
+        keys.append(tuple(item.pop(alias) for alias in key_aliases))
+        items.append(item)
+    if before is not None:
+        items.reverse()
+        keys.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = after is not None, has_more
+    return {
+        "items": items,
+        "next": keys[-1] if items and has_next else None,
+        "prev": keys[0] if items and has_prev else None,
+    }
+
+@catalog_cached
+def get_components_page(category_id, after=None, before=None, limit=LIST_PAGE_SIZE, price_category_id=None):
+    """Страница компонентов категории по возрастанию цены (ключ - (price, id), NULL как 0)"""
+    where, params = "category_id = ?", [category_id]
+    if price_category_id is not None:
+        where += " AND price_category_id = ?"
+        params.append(price_category_id)
+    conn = get_catalog_connection()
+    page = _keyset_page(conn, "components", "id, name, price", where, params, ("COALESCE(price, 0)", "id"), after, before, limit)
+    conn.close()
+    return page
+
+@catalog_cached
+def get_builds_page(device_type_id, price_category_id, after=None, before=None, limit=LIST_PAGE_SIZE):
+    """Страница сборок по возрастанию стоимости (ключ - (total_price, id), NULL как 0)"""
+    conn = get_catalog_connection()
+    page = _keyset_page(
+        conn, "pc_builds", "id, name, total_price", "device_type_id = ? AND price_category_id = ?",
+        (device_type_id, price_category_id), ("COALESCE(total_price, 0)", "id"), after, before, limit
+    )
+    conn.close()
+    return page
+
+@catalog_cached
 def get_component_details(component_id):
     """Получение детальной информации о компоненте"""
-    conn = get_db_connection()
+    conn = get_catalog_connection()
     component = conn.execute("SELECT * FROM components WHERE id = ?", (component_id,)).fetchone()
     conn.close()
     
@@ -271,26 +1071,131 @@ def get_component_details(component_id):
     
     return result
 
+def find_components(category_id, **filters):
+    """Поиск компонентов категории по характеристикам из component_specs.
+
+    Фильтр key=value требует совпадения значения (можно передать список
+    допустимых значений), key_min/key_max задают границы числового значения:
+    find_components(1, socket="AM4", tdp_max=65).
+    """
+    # Списки значений приводим к кортежам, чтобы фильтры годились в ключ кэша
+    normalized = tuple(sorted(
+        (name, tuple(value) if isinstance(value, (list, tuple, set)) else value)
+        for name, value in filters.items()
+        if value is not None
+    ))
+    return _find_components(category_id, normalized)
+
+@catalog_cached
+def _find_components(category_id, filters):
+    conditions = ["category_id = ?"]
+    params = [category_id]
+    for name, value in filters:
+        if name.endswith("_min") or name.endswith("_max"):
+            key = normalize_spec_key(name[:-4])
+            operator = ">=" if name.endswith("_min") else "<="
+            conditions.append(
+                f"id IN (SELECT component_id FROM component_specs WHERE key = ? AND value_num {operator} ?)"
+            )
+            params.extend([key, value])
+        else:
+            key = normalize_spec_key(name)
+            values = value if isinstance(value, tuple) else [value]
+            values = [normalize_spec_value(key, item)[1] for item in values]
+            placeholders = ",".join("?" * len(values))
+            conditions.append(
+                f"id IN (SELECT component_id FROM component_specs WHERE key = ? AND value_text IN ({placeholders}))"
+            )
+            params.extend([key, *values])
+    conn = get_catalog_connection()
+    components = conn.execute(f"""
+        SELECT * FROM components
+        WHERE {" AND ".join(conditions)}
+        ORDER BY price
+    """, params).fetchall()
+    conn.close()
+    return [dict(row) for row in components]
+
+@catalog_cached
+def get_component_specs(component_id):
+    """Характеристики компонента в виде словаря ключ -> список значений"""
+    conn = get_catalog_connection()
+    rows = conn.execute(
+        "SELECT key, value_text FROM component_specs WHERE component_id = ? ORDER BY rowid",
+        (component_id,)
+    ).fetchall()
+    conn.close()
+    result = {}
+    for key, value_text in rows:
+        result.setdefault(key, []).append(value_text)
+    return result
+
+@invalidates_catalog
+def rebuild_component_specs():
+    """Полный пересчет характеристик после изменения компонентов в обход этого модуля"""
+    with db_connection() as conn:
+        return refresh_component_specs(conn)
+
 # Функции для добавления тестовых данных (используются для разработки)
 
-def add_component(name, category_id, price, price_category_id, description="", specs=None, image_url=None):
-    """Добавление компонента в базу данных"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+# Вставка компонента или обновление существующего с тем же естественным ключом.
+# Пустые значения (цена 0, пустые описание и ссылки) не затирают уже известные данные.
+_UPSERT_COMPONENT_SQL = """
+    INSERT INTO components (name, category_id, price, price_category_id, description, specs, image_url, link, natural_key)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (natural_key) DO UPDATE SET
+        price = CASE WHEN COALESCE(excluded.price, 0) > 0 THEN excluded.price ELSE components.price END,
+        price_category_id = CASE WHEN COALESCE(excluded.price, 0) > 0 THEN excluded.price_category_id ELSE components.price_category_id END,
+        description = COALESCE(NULLIF(excluded.description, ''), components.description),
+        specs = COALESCE(excluded.specs, components.specs),
+        image_url = COALESCE(excluded.image_url, components.image_url),
+        link = COALESCE(NULLIF(excluded.link, ''), components.link)
+"""
+
+def _component_row(name, category_id, price, price_category_id, description, specs, image_url, link):
     # Преобразуем спецификации в JSON, если они переданы
     specs_json = json.dumps(specs) if specs else None
-    
-    cursor.execute("""
-        INSERT INTO components (name, category_id, price, price_category_id, description, specs, image_url)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (name, category_id, price, price_category_id, description, specs_json, image_url))
-    
-    component_id = cursor.lastrowid
+    return (
+        name, category_id, price, price_category_id, description, specs_json, image_url, link,
+        component_natural_key(name, category_id, link)
+    )
+
+@invalidates_catalog
+def upsert_component(name, category_id, price, price_category_id, description="", specs=None, image_url=None, link=None):
+    """Добавление компонента или обновление существующего с тем же естественным ключом.
+
+    Ключ - id товара DNS из ссылки или хэш нормализованного названия в
+    категории. Возвращает id нового или уже существующего компонента.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    row = _component_row(name, category_id, price, price_category_id, description, specs, image_url, link)
+    cursor.execute(_UPSERT_COMPONENT_SQL, row)
+    component_id = cursor.execute("SELECT id FROM components WHERE natural_key = ?", (row[-1],)).fetchone()[0]
+    refresh_component_specs(conn, [component_id])
     conn.commit()
     conn.close()
     return component_id
 
+def add_component(name, category_id, price, price_category_id, description="", specs=None, image_url=None, link=None):
+    """Добавление компонента в базу данных (дубликат не создается, возвращается id существующего)"""
+    return upsert_component(name, category_id, price, price_category_id, description, specs, image_url, link)
+
+@invalidates_catalog
+def dedupe_components():
+    """Разовое слияние дубликатов компонентов по естественному ключу"""
+    conn = get_db_connection()
+    try:
+        merged_count = merge_duplicate_components(conn)
+        if merged_count:
+            # У оставшихся компонентов могли дополниться описание и specs
+            refresh_component_specs(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    return merged_count
+
+@invalidates_catalog
 def add_build(name, device_type_id, price_category_id, description="", component_ids=None, image_url=None, link=None):
     """Добавление сборки в базу данных"""
     conn = get_db_connection()
@@ -344,6 +1249,140 @@ def add_build(name, device_type_id, price_category_id, description="", component
     conn.close()
     return build_id
 
+def _get_price_ranges(conn):
+    return conn.execute(
+        "SELECT id, min_price, max_price FROM price_categories ORDER BY min_price"
+    ).fetchall()
+
+def _match_price_category(price, price_ranges, current_id=None):
+    """Подбор ценовой категории по цене (как в add_build).
+
+    Текущая категория сохраняется, если цена в нее попадает или если
+    такой категории нет в price_categories.
+    """
+    if current_id is not None:
+        current_range = next((r for r in price_ranges if r["id"] == current_id), None)
+        if current_range is None or current_range["min_price"] <= price <= current_range["max_price"]:
+            return current_id
+    for price_range in price_ranges:
+        if price_range["min_price"] <= price <= price_range["max_price"]:
+            return price_range["id"]
+    return current_id
+
+def _insert_many(cursor, sql, rows):
+    """Вставка строк внутри открытой транзакции с возвратом их id.
+
+    id берется из lastrowid после каждой вставки: SQLite не обещает, что
+    новые rowid идут подряд (AUTOINCREMENT, повторное использование rowid).
+    """
+    ids = []
+    for row in rows:
+        cursor.execute(sql, row)
+        ids.append(cursor.lastrowid)
+    return ids
+
+@invalidates_catalog
+def add_components_bulk(components) -> list:
+    """Массовое добавление компонентов одной транзакцией.
+
+    components - итерируемый набор словарей с ключами как у add_component
+    (name, category_id, price, price_category_id, description, specs,
+    image_url, link). Если price_category_id не задан, он подбирается по цене.
+    Компоненты с уже известным естественным ключом не дублируются.
+    Возвращает id компонентов в том же порядке.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        price_ranges = _get_price_ranges(cursor)
+        rows = []
+        for component in components:
+            price = component.get("price") or 0
+            price_category_id = component.get("price_category_id")
+            if price_category_id is None:
+                price_category_id = _match_price_category(price, price_ranges)
+            rows.append(_component_row(
+                component["name"], component.get("category_id"), price, price_category_id,
+                component.get("description", ""), component.get("specs"),
+                component.get("image_url"), component.get("link")
+            ))
+        cursor.executemany(_UPSERT_COMPONENT_SQL, rows)
+        # id находим по уникальному индексу естественного ключа
+        # (дубликаты внутри пакета и уже существующие компоненты получают один id)
+        component_ids = [
+            cursor.execute("SELECT id FROM components WHERE natural_key = ?", (row[-1],)).fetchone()[0]
+            for row in rows
+        ]
+        refresh_component_specs(conn, component_ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return component_ids
+
+@invalidates_catalog
+def add_builds_bulk(builds) -> list:
+    """Массовое добавление сборок одной транзакцией.
+
+    builds - итерируемый набор словарей с ключами как у add_build (name,
+    device_type_id, price_category_id, description, component_ids,
+    image_url, link). Общая стоимость считается по ценам компонентов одним
+    запросом, ценовая категория исправляется так же, как в add_build.
+    Возвращает id добавленных сборок в том же порядке.
+    """
+    builds = list(builds)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        price_ranges = _get_price_ranges(cursor)
+        
+        # Цены всех упомянутых компонентов получаем одним запросом через временную таблицу
+        all_component_ids = {component_id for build in builds for component_id in build.get("component_ids") or ()}
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS _bulk_component_ids (id INTEGER PRIMARY KEY)")
+        cursor.execute("DELETE FROM _bulk_component_ids")
+        cursor.executemany("INSERT INTO _bulk_component_ids (id) VALUES (?)", [(component_id,) for component_id in all_component_ids])
+        prices = dict(cursor.execute("""
+            SELECT c.id, c.price FROM components c
+            JOIN _bulk_component_ids t ON t.id = c.id
+        """).fetchall())
+        cursor.execute("DELETE FROM _bulk_component_ids")
+        
+        rows = []
+        for build in builds:
+            component_ids = build.get("component_ids") or []
+            # Как и в add_build, каждый компонент учитывается в стоимости один раз
+            total_price = sum(prices.get(component_id) or 0 for component_id in set(component_ids))
+            price_category_id = _match_price_category(total_price, price_ranges, build.get("price_category_id"))
+            rows.append((
+                build["name"], build.get("device_type_id"), price_category_id, total_price,
+                build.get("description", ""), build.get("image_url"), build.get("link")
+            ))
+        build_ids = _insert_many(cursor, """
+            INSERT INTO pc_builds (name, device_type_id, price_category_id, total_price, description, image_url, link)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        
+        cursor.executemany("""
+            INSERT INTO build_components (build_id, component_id)
+            VALUES (?, ?)
+        """, [
+            (build_id, component_id)
+            for build_id, build in zip(build_ids, builds)
+            for component_id in build.get("component_ids") or ()
+        ])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return build_ids
+
+@invalidates_catalog
 def add_test_data():
     """Добавление тестовых данных в базу данных"""
     conn = get_db_connection()
@@ -372,19 +1411,99 @@ def add_test_data():
     conn.close()
     print("Тестовые данные добавлены в базу данных")
 
-def get_random_build(device_type_id, price_category_id) -> dict:
+class RandomBuildPicker:
+    """Выбор случайной сборки за O(1) без ORDER BY RANDOM().
+
+    Держит в памяти списки id сборок для каждой пары
+    (device_type_id, price_category_id) и перечитывает их при смене версии
+    каталога. Для пользователя может выдавать сборки без повторов: у каждой
+    пары (пользователь, категория) есть перемешанная колода, из которой
+    сборки вынимаются до ее опустошения.
+    """
+
+    def __init__(self, max_decks=RANDOM_PICK_MAX_DECKS):
+        self.max_decks = max_decks
+        self._ids = {}
+        self._version = None
+        self._decks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        version = get_catalog_version()
+        if version == self._version:
+            return
+        conn = get_catalog_connection()
+        rows = conn.execute("SELECT id, device_type_id, price_category_id FROM pc_builds").fetchall()
+        conn.close()
+        ids = {}
+        for row in rows:
+            ids.setdefault((row["device_type_id"], row["price_category_id"]), []).append(row["id"])
+        with self._lock:
+            self._ids = ids
+            self._decks.clear()
+            self._version = version
+
+    def _draw_from_deck(self, user_id, key, ids, weights):
+        deck_key = (user_id, key)
+        deck = self._decks.pop(deck_key, None)
+        if not deck:
+            deck = list(ids)
+            random.shuffle(deck)
+        if weights:
+            index = random.choices(range(len(deck)), [weights.get(build_id, 1) for build_id in deck])[0]
+            deck[index], deck[-1] = deck[-1], deck[index]
+        build_id = deck.pop()
+        # Колоды хранятся в порядке последнего использования, старые вытесняются
+        self._decks[deck_key] = deck
+        while len(self._decks) > self.max_decks:
+            self._decks.popitem(last=False)
+        return build_id
+
+    def pick(self, device_type_id, price_category_id, user_id=None, weights=None):
+        """Выбор id случайной сборки.
+
+        weights - словарь {build_id: вес} для взвешенного выбора (сборки без
+        веса считаются с весом 1). Если передан user_id, сборки не повторяются,
+        пока пользователь не увидит все сборки категории.
+        """
+        self._refresh()
+        key = (device_type_id, price_category_id)
+        with self._lock:
+            ids = self._ids.get(key)
+            if not ids:
+                return None
+            if user_id is not None:
+                return self._draw_from_deck(user_id, key, ids, weights)
+        if weights:
+            return random.choices(ids, [weights.get(build_id, 1) for build_id in ids])[0]
+        return random.choice(ids)
+
+
+_random_build_picker = RandomBuildPicker()
+
+
+def get_random_build(device_type_id, price_category_id, user_id=None, weights=None) -> dict:
     """Получение случайной сборки со всеми компонентами"""
-    conn = get_db_connection()
+    build_id = _random_build_picker.pick(device_type_id, price_category_id, user_id=user_id, weights=weights)
+    if build_id is None:
+        return None
+    return _get_build_with_components(build_id)
+
+@catalog_cached
+def _get_build_with_components(build_id):
+    """Сборка с компонентами для get_random_build.
+
+    Результат кэшируется до изменения каталога, поэтому specs каждого
+    компонента разбирается из JSON один раз, а не при каждом выборе сборки.
+    """
+    conn = get_catalog_connection()
     cursor = conn.cursor()
     
-    # Получаем случайную сборку с учетом типа устройства и ценовой категории
     cursor.execute("""
         SELECT id, name, device_type_id, price_category_id, total_price, description, link
         FROM pc_builds
-        WHERE device_type_id = ? AND price_category_id = ?
-        ORDER BY RANDOM()
-        LIMIT 1
-    """, (device_type_id, price_category_id))
+        WHERE id = ?
+    """, (build_id,))
     build = cursor.fetchone()
     
     if not build:
@@ -444,29 +1563,142 @@ def add_page_data(url: str, page_text: str) -> int:
 
 def get_page_data(page_id: int) -> dict:
     """Получение данных страницы по ID"""
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     page = conn.execute("SELECT * FROM page_data WHERE id = ?", (page_id,)).fetchone()
     conn.close()
     return dict(page) if page else None
 
 def get_all_page_data() -> list:
     """Получение всех записей страниц"""
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     pages = conn.execute("SELECT * FROM page_data ORDER BY created_at DESC").fetchall()
     conn.close()
     return [dict(page) for page in pages]
 
-def search_page_data(query: str) -> list:
-    """Поиск по тексту страниц"""
+def _table_exists(conn, name):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (name,)
+    ).fetchone()
+    return row is not None
+
+def build_fts_query(text: str, prefix: bool = False) -> str:
+    """Преобразование пользовательского запроса в безопасный запрос FTS5.
+
+    Каждое слово берется в кавычки, чтобы спецсимволы синтаксиса FTS5 из
+    ввода пользователя не ломали запрос. Слова объединяются через AND.
+    """
+    terms = re.findall(r"\w+", text.lower())
+    suffix = "*" if prefix else ""
+    return " ".join(f'"{term}"{suffix}' for term in terms)
+
+def search_page_data(query: str, limit: int = 20, offset: int = 0) -> list:
+    """Поиск по тексту страниц.
+
+    Результаты ранжируются по bm25 и содержат поле snippet с фрагментом
+    текста вокруг найденных слов.
+    """
+    conn = get_db_connection(readonly=True)
+    try:
+        if not _table_exists(conn, "page_data_fts"):
+            # SQLite без FTS5: медленный поиск по подстроке
+            pages = conn.execute(
+                """
+                SELECT *, NULL AS snippet FROM page_data
+                WHERE page_text LIKE ? OR url LIKE ?
+                ORDER BY created_at DESC
+                LIMIT ? OFFSET ?
+                """,
+                (f"%{query}%", f"%{query}%", limit, offset)
+            ).fetchall()
+            return [dict(page) for page in pages]
+        fts_query = build_fts_query(query)
+        if not fts_query:
+            return []
+        pages = conn.execute(
+            """
+            SELECT p.*, snippet(page_data_fts, 1, '[', ']', '…', 16) AS snippet
+            FROM page_data_fts
+            JOIN page_data p ON p.id = page_data_fts.rowid
+            WHERE page_data_fts MATCH ?
+            ORDER BY bm25(page_data_fts)
+            LIMIT ? OFFSET ?
+            """,
+            (fts_query, limit, offset)
+        ).fetchall()
+        return [dict(page) for page in pages]
+    finally:
+        conn.close()
+
+def search_catalog(query: str, limit: int = 10, offset: int = 0) -> list:
+    """Поиск компонентов и сборок по названию, описанию и характеристикам.
+
+    Каждое слово запроса ищется по началу слова, результаты ранжируются по
+    bm25 (совпадение в названии весит больше). Возвращает список словарей
+    с полями kind ('component' или 'build'), id, name, price.
+    """
+    conn = get_catalog_connection()
+    try:
+        if not _table_exists(conn, "catalog_fts"):
+            # SQLite без FTS5: поиск по подстроке в названиях
+            rows = conn.execute(
+                """
+                SELECT 'component' AS kind, id, name, price FROM components WHERE name LIKE ?
+                UNION ALL
+                SELECT 'build' AS kind, id, name, total_price AS price FROM pc_builds WHERE name LIKE ?
+                ORDER BY name
+                LIMIT ? OFFSET ?
+                """,
+                (f"%{query}%", f"%{query}%", limit, offset)
+            ).fetchall()
+            return [dict(row) for row in rows]
+        fts_query = build_fts_query(query, prefix=True)
+        if not fts_query:
+            return []
+        rows = conn.execute(
+            """
+            SELECT f.kind, f.ref_id AS id, f.name,
+                   CASE f.kind WHEN 'component' THEN c.price ELSE b.total_price END AS price
+            FROM catalog_fts f
+            LEFT JOIN components c ON f.kind = 'component' AND c.id = f.ref_id
+            LEFT JOIN pc_builds b ON f.kind = 'build' AND b.id = f.ref_id
+            WHERE catalog_fts MATCH ?
+            ORDER BY bm25(catalog_fts, 0, 0, 10.0, 2.0, 1.0)
+            LIMIT ? OFFSET ?
+            """,
+            (fts_query, limit, offset)
+        ).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+def rebuild_catalog_index():
+    """Перестроение полнотекстового индекса компонентов и сборок"""
     conn = get_db_connection()
-    pages = conn.execute(
-        "SELECT * FROM page_data WHERE page_text LIKE ? OR url LIKE ? ORDER BY created_at DESC",
-        (f"%{query}%", f"%{query}%")
-    ).fetchall()
+    if not _table_exists(conn, "catalog_fts"):
+        conn.close()
+        print("Полнотекстовый индекс каталога недоступен (SQLite без FTS5)")
+        return False
+    conn.execute("DELETE FROM catalog_fts")
+    conn.execute(CATALOG_FTS_FILL_SQL)
+    conn.commit()
     conn.close()
-    return [dict(page) for page in pages]
+    return True
+
+def rebuild_page_data_index():
+    """Перестроение полнотекстового индекса по всем записям page_data"""
+    conn = get_db_connection()
+    if not _table_exists(conn, "page_data_fts"):
+        conn.close()
+        print("Полнотекстовый индекс page_data недоступен (SQLite без FTS5)")
+        return False
+    conn.execute("INSERT INTO page_data_fts (page_data_fts) VALUES ('rebuild')")
+    conn.commit()
+    conn.close()
+    return True
 
 
+@invalidates_catalog
 def init_basic_data():
     """Инициализация базовых данных (категории, типы устройств, ценовые категории)"""
     conn = get_db_connection()
@@ -522,101 +1754,284 @@ def init_basic_data():
     conn.close()
     print("Базовые данные инициализированы")
 
+# Таблицы, из которых разрешено удаление через purge
+PURGE_TABLES = (
+    "components", "pc_builds", "build_components",
+    "page_data", "suggestions", "users",
+)
+
+@invalidates_catalog
+def purge(table, where, params=()):
+    """Удаление строк таблицы по условию одной командой DELETE.
+
+    where - SQL-условие с параметрами-плейсхолдерами, например "link IS NULL"
+    или "id = ?". Связи build_components удаляются каскадно вместе со
+    сборками и компонентами, предложения - вместе с пользователями.
+    Возвращает количество удаленных строк.
+    """
+    if table not in PURGE_TABLES:
+        raise ValueError(f"Удаление из таблицы {table} не поддерживается")
+    with db_connection() as conn:
+        return conn.execute(f"DELETE FROM {table} WHERE {where}", params).rowcount
+
 def delete_build(build_id):
-    """Удаление сборки из базы данных"""
+    """Удаление сборки из базы данных (связи с компонентами удаляются каскадно)"""
+    purge("pc_builds", "id = ?", (build_id,))
+
+# Переклассификация одной командой UPDATE ... FROM для каждой таблицы.
+# Берется первая по min_price подходящая категория, как раньше в fix_price_categories.
+# Компоненты без известной цены (0 или NULL) не трогаем: их категория задана вручную.
+_RECLASSIFY_SQL = {
+    "pc_builds": """
+        UPDATE pc_builds SET price_category_id = matched.category_id
+        FROM (
+            SELECT b.id AS row_id, pc.id AS category_id,
+                   ROW_NUMBER() OVER (PARTITION BY b.id ORDER BY pc.min_price, pc.id) AS rn
+            FROM pc_builds b
+            JOIN price_categories pc ON pc.min_price <= b.total_price AND pc.max_price >= b.total_price
+        ) AS matched
+        WHERE matched.row_id = pc_builds.id AND matched.rn = 1
+          AND pc_builds.price_category_id IS NOT matched.category_id
+    """,
+    "components": """
+        UPDATE components SET price_category_id = matched.category_id
+        FROM (
+            SELECT c.id AS row_id, pc.id AS category_id,
+                   ROW_NUMBER() OVER (PARTITION BY c.id ORDER BY pc.min_price, pc.id) AS rn
+            FROM components c
+            JOIN price_categories pc ON pc.min_price <= c.price AND pc.max_price >= c.price
+            WHERE c.price > 0
+        ) AS matched
+        WHERE matched.row_id = components.id AND matched.rn = 1
+          AND components.price_category_id IS NOT matched.category_id
+    """,
+}
+
+def reclassify_price_categories_in(conn) -> dict:
+    """Переклассификация сборок и компонентов в рамках текущей транзакции conn.
+
+    Возвращает количество перенесенных строк по таблицам.
+    """
+    moved = {}
+    for table, sql in _RECLASSIFY_SQL.items():
+        moved[table] = conn.execute(sql).rowcount
+    return moved
+
+@invalidates_catalog
+def reclassify_price_categories() -> dict:
+    """Приведение ценовых категорий сборок и компонентов в соответствие с диапазонами цен.
+
+    Возвращает словарь {таблица: количество строк, сменивших категорию}.
+    """
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Удаляем связи сборки с компонентами
-    cursor.execute("DELETE FROM build_components WHERE build_id = ?", (build_id,))
-    
-    # Удаляем саму сборку
-    cursor.execute("DELETE FROM pc_builds WHERE id = ?", (build_id,))
-    
-    conn.commit()
-    conn.close()
+    try:
+        moved = reclassify_price_categories_in(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    return moved
 
 def fix_price_categories():
-    """Исправление ценовых категорий для существующих сборок"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Получаем все сборки
-    cursor.execute("SELECT id, total_price FROM pc_builds")
-    builds = cursor.fetchall()
-    
-    # Для каждой сборки проверяем и исправляем ценовую категорию
-    for build in builds:
-        # Находим подходящую ценовую категорию
-        cursor.execute("""
-            SELECT id FROM price_categories 
-            WHERE min_price <= ? AND max_price >= ?
-            ORDER BY min_price
-            LIMIT 1
-        """, (build["total_price"], build["total_price"]))
-        correct_category = cursor.fetchone()
-        
-        if correct_category:
-            # Обновляем ценовую категорию сборки
-            cursor.execute("""
-                UPDATE pc_builds 
-                SET price_category_id = ? 
-                WHERE id = ?
-            """, (correct_category["id"], build["id"]))
-    
-    conn.commit()
+    """Исправление ценовых категорий для существующих сборок и компонентов"""
+    moved = reclassify_price_categories()
+    print(f"Ценовые категории исправлены: сборок - {moved['pc_builds']}, компонентов - {moved['components']}")
+
+# История цен: колонка price_history для каждого вида записей
+PRICE_HISTORY_COLUMNS = {"component": "component_id", "build": "build_id"}
+# Категории компонентов парсера components_parser
+SCRAPED_CATEGORY_IDS = {"cpu": 1, "gpu": 2, "ram": 3, "storage": 4, "motherboard": 5}
+
+def _price_history_column(kind):
+    if kind not in PRICE_HISTORY_COLUMNS:
+        raise ValueError(f"Неизвестный вид записи истории цен: {kind}")
+    return PRICE_HISTORY_COLUMNS[kind]
+
+def _parse_ts(value):
+    """Метка времени в секундах из datetime, строки 'YYYY-MM-DD HH:MM:SS' или числа"""
+    if value is None:
+        return int(time.time())
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, str):
+        return int(datetime.strptime(value, "%Y-%m-%d %H:%M:%S").timestamp())
+    return int(value)
+
+def record_prices(prices, source="manual"):
+    """Запись цен компонентов в историю.
+
+    prices - набор (component_id, цена в рублях[, метка времени]). Строка
+    добавляется, только если цена отличается от последней записанной.
+    Возвращает количество добавленных строк.
+    """
+    rows = []
+    for item in prices:
+        component_id, price = item[0], item[1]
+        ts = _parse_ts(item[2] if len(item) > 2 else None)
+        rows.append({"component_id": component_id, "ts": ts, "price_kop": int(round(price * 100)), "source": source})
+    with db_connection() as conn:
+        cursor = conn.executemany("""
+            INSERT INTO price_history (component_id, ts, price_kop, source)
+            SELECT :component_id, :ts, :price_kop, :source
+            WHERE :component_id IN (SELECT id FROM components)
+              AND :price_kop IS NOT (
+                SELECT price_kop FROM price_history
+                WHERE component_id = :component_id ORDER BY ts DESC, id DESC LIMIT 1
+              )
+        """, rows)
+        return cursor.rowcount
+
+def record_scraped_prices(components):
+    """Запись цен из components_parser в историю цен компонентов каталога.
+
+    components - словарь категория парсера -> список товаров с полями title,
+    price, url, source и date_parsed (или date). Товар сопоставляется с компонентом по
+    естественному ключу (id товара DNS или нормализованное название).
+    Возвращает количество добавленных строк.
+    """
+    keys = []
+    for category, items in components.items():
+        category_id = SCRAPED_CATEGORY_IDS.get(category)
+        for item in items:
+            if not item.get("price"):
+                continue
+            keys.append((
+                component_natural_key(item["title"], category_id, item.get("url")),
+                item["price"], item.get("date_parsed") or item.get("date"), item.get("source") or "parser"
+            ))
+    if not keys:
+        return 0
+    conn = get_db_connection(readonly=True)
+    id_by_key = {}
+    for key, _, _, _ in keys:
+        row = conn.execute("SELECT id FROM components WHERE natural_key = ?", (key,)).fetchone()
+        if row:
+            id_by_key[key] = row[0]
     conn.close()
-    print("Ценовые категории сборок исправлены")
+    recorded = 0
+    by_source = {}
+    for key, price, date_parsed, source in keys:
+        if key in id_by_key:
+            by_source.setdefault(source, []).append((id_by_key[key], price, date_parsed))
+    for source, prices in by_source.items():
+        recorded += record_prices(prices, source=source)
+    return recorded
 
-def copy_components_from_builds():
-    """Копирование компонентов из сборок в таблицу компонентов"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Получаем все сборки
-    cursor.execute("SELECT id FROM pc_builds")
-    builds = cursor.fetchall()
-    
-    for build in builds:
-        build_id = build[0]
-        # Получаем компоненты сборки
-        cursor.execute("""
-            SELECT c.* FROM components c
-            JOIN build_components bc ON c.id = bc.component_id
-            WHERE bc.build_id = ?
-        """, (build_id,))
-        components = cursor.fetchall()
-        
-        # Для каждого компонента проверяем, есть ли он уже в таблице components
-        for component in components:
-            cursor.execute("""
-                SELECT id FROM components 
-                WHERE name = ? AND category_id = ? AND price_category_id = ?
-            """, (component['name'], component['category_id'], component['price_category_id']))
-            existing = cursor.fetchone()
-            
-            if not existing:
-                # Если компонента нет, добавляем его
-                cursor.execute("""
-                    INSERT INTO components (name, category_id, price_category_id, price, description, specs, image_url)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    component['name'],
-                    component['category_id'],
-                    component['price_category_id'],
-                    component['price'],
-                    component['description'],
-                    component['specs'],
-                    component['image_url']
-                ))
-    
-    conn.commit()
+def get_price_history(item_id, kind="component", limit=10):
+    """Последние limit изменений цены: список (ts, цена в рублях), новые первыми"""
+    column = _price_history_column(kind)
+    conn = get_db_connection(readonly=True)
+    rows = conn.execute(f"""
+        SELECT ts, price_kop FROM price_history
+        WHERE {column} = ?
+        ORDER BY ts DESC, id DESC
+        LIMIT ?
+    """, (item_id, limit)).fetchall()
+    conn.close()
+    return [(row[0], row[1] / 100) for row in rows]
+
+def get_price_stats(item_id, kind="component", since=None):
+    """Минимальная, максимальная и последняя цена (в рублях) с момента since"""
+    column = _price_history_column(kind)
+    since_ts = _parse_ts(since) if since is not None else 0
+    conn = get_db_connection(readonly=True)
+    row = conn.execute(f"""
+        SELECT MIN(price_kop), MAX(price_kop), COUNT(*), MIN(ts), MAX(ts) FROM price_history
+        WHERE {column} = ? AND ts >= ?
+    """, (item_id, since_ts)).fetchone()
+    last = conn.execute(f"""
+        SELECT price_kop FROM price_history
+        WHERE {column} = ?
+        ORDER BY ts DESC, id DESC
+        LIMIT 1
+    """, (item_id,)).fetchone()
+    conn.close()
+    if not row[2]:
+        return None
+    return {
+        "min": row[0] / 100,
+        "max": row[1] / 100,
+        "last": last[0] / 100,
+        "changes": row[2],
+        "first_ts": row[3],
+        "last_ts": row[4],
+    }
+
+def get_price_series(item_id, kind="component", start=None, end=None, points=30):
+    """Цена, прореженная до points равных интервалов от start до end.
+
+    История хранит только изменения, поэтому значение интервала - последняя
+    известная к его концу цена. Возвращает список (начало интервала, цена
+    в рублях или None, если цена еще неизвестна).
+    """
+    column = _price_history_column(kind)
+    end_ts = _parse_ts(end)
+    start_ts = _parse_ts(start) if start is not None else end_ts - 30 * 24 * 3600
+    # Округляем шаг вверх, чтобы последний интервал захватывал end
+    step = max(1, -(-(end_ts - start_ts) // points))
+    conn = get_db_connection(readonly=True)
+    # Цена на начало периода и последняя цена в каждом интервале
+    initial = conn.execute(f"""
+        SELECT price_kop FROM price_history
+        WHERE {column} = ? AND ts < ?
+        ORDER BY ts DESC, id DESC
+        LIMIT 1
+    """, (item_id, start_ts)).fetchone()
+    buckets = dict(conn.execute(f"""
+        SELECT bucket, price_kop FROM (
+            SELECT (ts - :start) / :step AS bucket, price_kop,
+                   ROW_NUMBER() OVER (PARTITION BY (ts - :start) / :step ORDER BY ts DESC, id DESC) AS rn
+            FROM price_history
+            WHERE {column} = :item_id AND ts >= :start AND ts < :start + :step * :points
+        )
+        WHERE rn = 1
+    """, {"item_id": item_id, "start": start_ts, "step": step, "points": points}).fetchall())
     conn.close()
+    series = []
+    price_kop = initial[0] if initial else None
+    for bucket in range(points):
+        price_kop = buckets.get(bucket, price_kop)
+        series.append((start_ts + bucket * step, price_kop / 100 if price_kop is not None else None))
+    return series
+
+def get_price_drops(since=None, limit=20):
+    """Компоненты, подешевевшие с момента since (по умолчанию за неделю).
+
+    Возвращает список словарей id, name, old_price, price, отсортированный
+    по величине снижения.
+    """
+    since_ts = _parse_ts(since) if since is not None else int(time.time()) - 7 * 24 * 3600
+    conn = get_db_connection(readonly=True)
+    rows = conn.execute("""
+        SELECT c.id, c.name, before.price_kop AS old_kop, latest.price_kop AS new_kop
+        FROM components c
+        JOIN price_history latest ON latest.id = (
+            SELECT id FROM price_history
+            WHERE component_id = c.id ORDER BY ts DESC, id DESC LIMIT 1
+        )
+        JOIN price_history before ON before.id = (
+            SELECT id FROM price_history
+            WHERE component_id = c.id AND ts < ? ORDER BY ts DESC, id DESC LIMIT 1
+        )
+        WHERE latest.price_kop < before.price_kop
+        ORDER BY before.price_kop - latest.price_kop DESC
+        LIMIT ?
+    """, (since_ts, limit)).fetchall()
+    conn.close()
+    return [
+        {"id": row[0], "name": row[1], "old_price": row[2] / 100, "price": row[3] / 100}
+        for row in rows
+    ]
 
 def add_suggestion(user_id: int, suggestion_text: str) -> int:
     """Добавляет новое предложение от пользователя"""
     conn = get_db_connection()
     cursor = conn.cursor()
+    # Предложение может прийти от пользователя, который не нажимал /start
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cursor.execute(
+        "INSERT OR IGNORE INTO users (user_id, registration_date, last_active) VALUES (?, ?, ?)",
+        (user_id, current_time, current_time)
+    )
     cursor.execute(
         "INSERT INTO suggestions (user_id, suggestion_text) VALUES (?, ?)",
         (user_id, suggestion_text)
@@ -628,7 +2043,7 @@ def add_suggestion(user_id: int, suggestion_text: str) -> int:
 
 def get_user_suggestions(user_id: int) -> list:
     """Получает все предложения пользователя"""
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     cursor = conn.cursor()
     cursor.execute(
         "SELECT * FROM suggestions WHERE user_id = ? ORDER BY created_at DESC",
@@ -667,10 +2082,11 @@ def update_suggestion_status(suggestion_id: int, status: str) -> bool:
     conn.close()
     return success
 
+# Порядок полей в кортежах данных bulk_add_* для компонентов
+BULK_COMPONENT_FIELDS = ("name", "category_id", "price", "price_category_id", "description", "link")
+
+@invalidates_catalog
 def bulk_add_processors():
-    import sqlite3
-    conn = sqlite3.connect('bot_database.db')
-    cursor = conn.cursor()
     data = [
         ("Intel Core i3-10105 BOX", 1, 0, 1, "Современный процессор для офисных и домашних ПК", "https://www.dns-shop.ru/product/182b754efc02ed20/processor-intel-core-i3-10105-box/"),
         ("AMD Ryzen 9 7900X3D BOX", 1, 0, 3, "Топовый процессор для игровых и рабочих станций", "https://www.dns-shop.ru/product/3e574ae0e4a5ed20/processor-amd-ryzen-9-7900x3d-box/"),
@@ -701,13 +2117,11 @@ def bulk_add_processors():
         ("AMD Ryzen 7 7800X3D OEM", 1, 0, 3, "Процессор с 3D V-Cache для максимальной производительности", "https://www.dns-shop.ru/product/3ecad0b7a46fed20/processor-amd-ryzen-7-7800x3d-oem/"),
         ("AMD Ryzen 5 7500F OEM", 1, 0, 1, "Современный 6-ядерный процессор", "https://www.dns-shop.ru/product/d4bde9994d11ed20/processor-amd-ryzen-5-7500f-oem/")
     ]
-    cursor.executemany("INSERT INTO components (name, category_id, price, price_category_id, description, link) VALUES (?, ?, ?, ?, ?, ?)", data)
-    conn.commit()
-    conn.close()
+    add_components_bulk(dict(zip(BULK_COMPONENT_FIELDS, row)) for row in data)
 
+@invalidates_catalog
 def update_processor_descriptions():
-    import sqlite3
-    conn = sqlite3.connect('bot_database.db')
+    conn = get_db_connection()
     cursor = conn.cursor()
     # Список универсальных описаний по ключевым словам в названии
     updates = [
@@ -744,10 +2158,8 @@ def update_processor_descriptions():
     conn.commit()
     conn.close()
 
+@invalidates_catalog
 def bulk_add_motherboards():
-    import sqlite3
-    conn = sqlite3.connect('bot_database.db')
-    cursor = conn.cursor()
     data = [
         ("MSI B650M GAMING PLUS WIFI", 5, 0, 2, "Материнская плата на чипсете B650, сокет AM5, поддержка DDR5, M.2, Wi-Fi. Для современных процессоров AMD Ryzen.", "https://www.dns-shop.ru/product/77439794ba6ded20/materinskaa-plata-msi-b650m-gaming-plus-wifi/"),
         ("MSI PRO B650-S WIFI", 5, 0, 2, "Материнская плата на чипсете B650, сокет AM5, поддержка DDR5, Wi-Fi. Для AMD Ryzen 7000/8000.", "https://www.dns-shop.ru/product/7d98e5645604ed20/materinskaa-plata-msi-pro-b650-s-wifi/"),
@@ -767,14 +2179,10 @@ def bulk_add_motherboards():
         ("ASUS TUF GAMING B760-PLUS WIFI", 5, 0, 2, "Материнская плата на чипсете B760, сокет LGA1700, поддержка DDR4, Wi-Fi. Для игровых и универсальных ПК на Intel.", "https://www.dns-shop.ru/product/02b7d698ab7ced20/materinskaa-plata-asus-tuf-gaming-b760-plus-wifi/"),
         ("MSI PRO B760M-A DDR4 II", 5, 0, 2, "Материнская плата на чипсете B760, сокет LGA1700, поддержка DDR4, M.2. Для современных процессоров Intel.", "https://www.dns-shop.ru/product/f83aa9e8cedbed20/materinskaa-plata-msi-pro-b760m-a-ddr4-ii/")
     ]
-    cursor.executemany("INSERT INTO components (name, category_id, price, price_category_id, description, link) VALUES (?, ?, ?, ?, ?, ?)", data)
-    conn.commit()
-    conn.close()
+    add_components_bulk(dict(zip(BULK_COMPONENT_FIELDS, row)) for row in data)
 
+@invalidates_catalog
 def bulk_add_gpus():
-    import sqlite3
-    conn = sqlite3.connect('bot_database.db')
-    cursor = conn.cursor()
     data = [
         ("Sapphire AMD Radeon RX 550 Pulse OC", 2, 0, 1, "Видеокарта на чипе RX 550, 4 ГБ GDDR5, HDMI, DVI, компактная и энергоэффективная. Для офисных и мультимедийных ПК.", "https://www.dns-shop.ru/product/6af1cb5a28903330/videokarta-sapphire-amd-radeon-rx-550-pulse-oc-11268-01-20g/"),
         ("MSI GeForce 210 N210-1GD3LP", 2, 0, 1, "Базовая видеокарта для офисных ПК и мультимедиа, 1 ГБ DDR3, DVI, VGA, HDMI.", "https://www.dns-shop.ru/product/5a7b4c6d0bc3c823/videokarta-msi-geforce-210-n210-1gd3lp/"),
@@ -794,14 +2202,10 @@ def bulk_add_gpus():
         ("Palit GeForce RTX 5070 Infinity 3", 2, 0, 3, "Видеокарта на чипе RTX 5070, 12 ГБ GDDR6X, HDMI, DisplayPort. Для требовательных игр и работы.", "https://www.dns-shop.ru/product/b58aaa7e00a9d582/videokarta-palit-geforce-rtx-5070-infinity-3-ne75070019k9-gb2050s/"),
         ("MSI GeForce RTX 3050 Gaming X", 2, 0, 2, "Видеокарта на чипе RTX 3050, 8 ГБ GDDR6, HDMI, DisplayPort. Для Full HD-гейминга.", "https://www.dns-shop.ru/product/a1560975bc27ed20/videokarta-msi-geforce-rtx-3050-gaming-x-912-v812-024/")
     ]
-    cursor.executemany("INSERT INTO components (name, category_id, price, price_category_id, description, link) VALUES (?, ?, ?, ?, ?, ?)", data)
-    conn.commit()
-    conn.close()
+    add_components_bulk(dict(zip(BULK_COMPONENT_FIELDS, row)) for row in data)
 
+@invalidates_catalog
 def bulk_add_ram():
-    import sqlite3
-    conn = sqlite3.connect('bot_database.db')
-    cursor = conn.cursor()
     data = [
         ("Kingston FURY Beast Black RGB KF556C36BBEAK2-32 32 ГБ", 3, 0, 2, "DDR5, 32 ГБ (2x16 ГБ), 5600 МГц, RGB-подсветка, поддержка XMP. Для современных игровых и рабочих ПК.", "https://www.dns-shop.ru/product/82dbb4b53960ed20/operativnaa-pamat-kingston-fury-beast-black-rgb-kf556c36bbeak2-32-32-gb/"),
         ("ADATA XPG Lancer AX5U6000C3032G-DCLABK 64 ГБ", 3, 0, 3, "DDR5, 64 ГБ (2x32 ГБ), 6000 МГц, поддержка XMP. Для топовых игровых и рабочих станций.", "https://www.dns-shop.ru/product/65fdeb5051f8ed20/operativnaa-pamat-adata-xpg-lancer-ax5u6000c3032g-dclabk-64-gb/"),
@@ -822,14 +2226,10 @@ def bulk_add_ram():
         ("Kingston FURY Beast Black KF432C16BBK232 32 ГБ", 3, 0, 2, "DDR4, 32 ГБ (2x16 ГБ), 3200 МГц, поддержка XMP. Универсальный выбор для апгрейда.", "https://www.dns-shop.ru/product/9ed60ce7fae5ed20/operativnaa-pamat-kingston-fury-beast-black-kf432c16bbk232-32-gb/"),
         ("Kingston FURY Beast Black KF556C36BBEK2-32 32 ГБ", 3, 0, 2, "DDR5, 32 ГБ (2x16 ГБ), 5600 МГц, поддержка XMP. Для современных ПК.", "https://www.dns-shop.ru/product/17e2942c3953ed20/operativnaa-pamat-kingston-fury-beast-black-kf556c36bbek2-32-32-gb/")
     ]
-    cursor.executemany("INSERT INTO components (name, category_id, price, price_category_id, description, link) VALUES (?, ?, ?, ?, ?, ?)", data)
-    conn.commit()
-    conn.close()
+    add_components_bulk(dict(zip(BULK_COMPONENT_FIELDS, row)) for row in data)
 
+@invalidates_catalog
 def bulk_add_coolers():
-    import sqlite3
-    conn = sqlite3.connect('bot_database.db')
-    cursor = conn.cursor()
     data = [
         ("ID-COOLING SE-224-XTS ARGB", 7, 0, 2, "Кулер для процессора, 4 тепловые трубки, ARGB-подсветка, поддержка LGA1700/AM4. Эффективное и тихое охлаждение.", "https://www.dns-shop.ru/product/5e2127f83401ed20/kuler-dla-processora-id-cooling-se-224-xts-argb/"),
         ("Deepcool AG620 R AG620-BKNNMN-G-1", 7, 0, 2, "Кулер для процессора, 6 тепловых трубок, двойной вентилятор, поддержка LGA1700/AM4. Для мощных процессоров.", "https://www.dns-shop.ru/product/f2c7e6bcea8aed20/kuler-dla-processora-deepcool-ag620-r-ag620-bknnmn-g-1/"),
@@ -850,14 +2250,10 @@ def bulk_add_coolers():
         ("MSI MEG CORELIQUID S360", 7, 0, 3, "СЖО, радиатор 360 мм, ARGB, поддержка современных сокетов. Для топовых игровых и рабочих ПК.", "https://www.dns-shop.ru/product/d36de8b0f8efd763/sistema-ohlazdenia-msi-meg-coreliquid-s360/"),
         ("MSI MAG CORELIQUID E360", 7, 0, 3, "СЖО, радиатор 360 мм, ARGB, поддержка современных сокетов. Для мощных игровых и рабочих ПК.", "https://www.dns-shop.ru/product/487c25b102e2d582/sistema-ohlazdenia-msi-mag-coreliquid-e360/")
     ]
-    cursor.executemany("INSERT INTO components (name, category_id, price, price_category_id, description, link) VALUES (?, ?, ?, ?, ?, ?)", data)
-    conn.commit()
-    conn.close()
+    add_components_bulk(dict(zip(BULK_COMPONENT_FIELDS, row)) for row in data)
 
+@invalidates_catalog
 def bulk_add_office_pcs():
-    import sqlite3
-    conn = sqlite3.connect('bot_database.db')
-    cursor = conn.cursor()
     data = [
         ("Мини ПК Acer Gadget E10 ETBox", 2, 0, 1, "Intel Core i5-12450H, 16 ГБ DDR5, SSD 512 ГБ, Windows 11 Pro, DisplayPort, HDMI, VGA, Wi-Fi, Bluetooth, блок питания 120 Вт.", "https://www.dns-shop.ru/product/1bf47191dc70d9cb/mini-pk-acer-gadget-e10-etbox-1746843/"),
         ("ПК DEXP Atlas H494", 2, 0, 1, "Intel Core i3-12100, 8 ГБ DDR4, SSD 256 ГБ, без ОС, HDMI, VGA, Intel H610, блок питания 350 Вт.", "https://www.dns-shop.ru/product/fb7372ffa6ecd582/pk-dexp-atlas-h494/"),
@@ -873,41 +2269,20 @@ def bulk_add_office_pcs():
         ("Мини ПК Inferit Mini INFR0706W", 2, 0, 1, "Intel Celeron J4125, 8 ГБ DDR4, SSD 256 ГБ, Windows 10 Pro, HDMI, VGA, блок питания 220 Вт.", "https://www.dns-shop.ru/product/5d2722dfac8bd9cb/mini-pk-inferit-mini-infr0706w/"),
         ("ПК DEXP Atlas H465", 2, 0, 1, "Intel Core i3-12100, 8 ГБ DDR4, SSD 512 ГБ, без ОС, HDMI, VGA, Intel H610, блок питания 400 Вт.", "https://www.dns-shop.ru/product/7b7437865f64d0a4/pk-dexp-atlas-h465/")
     ]
-    cursor.executemany("INSERT INTO components (name, category_id, price, price_category_id, description, link) VALUES (?, ?, ?, ?, ?, ?)", data)
-    conn.commit()
-    conn.close()
+    add_components_bulk(dict(zip(BULK_COMPONENT_FIELDS, row)) for row in data)
 
 def delete_components_without_links():
-    """Удаление компонентов без ссылок"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Получаем все компоненты без ссылок
-    cursor.execute("SELECT id FROM components WHERE link IS NULL OR link = ''")
-    components_to_delete = cursor.fetchall()
-    
-    if not components_to_delete:
+    """Удаление компонентов без ссылок (связи со сборками удаляются каскадно)"""
+    deleted_count = purge("components", "link IS NULL OR link = ''")
+    if not deleted_count:
         print("Компоненты без ссылок не найдены")
-        conn.close()
         return
-    
-    # Удаляем связи в таблице build_components
-    for component in components_to_delete:
-        cursor.execute("DELETE FROM build_components WHERE component_id = ?", (component[0],))
-    
-    # Удаляем сами компоненты
-    cursor.execute("DELETE FROM components WHERE link IS NULL OR link = ''")
-    
-    deleted_count = cursor.rowcount
-    conn.commit()
-    conn.close()
-    
     print(f"Удалено {deleted_count} компонентов без ссылок")
 
+@invalidates_catalog
 def bulk_add_office_builds():
     """Массовое добавление офисных бюджетных ПК в сборки (pc_builds)"""
-    import sqlite3
-    conn = sqlite3.connect('bot_database.db')
+    conn = get_db_connection()
     cursor = conn.cursor()
     data = [
         ("Мини ПК Acer Gadget E10 ETBox [1746843]", 2, 1, 0, "Intel Core i5-12450H, 4 x 2 ГГц, 16 ГБ DDR5, SSD 512 ГБ, Windows 11 Pro, 1 x DisplayPort, 1 x HDMI, 1 x VGA (D-Sub), Wi-Fi, Bluetooth, SoC, блок питания - 120 Вт. Для уточнения цены перейдите по ссылке.", None, "https://www.dns-shop.ru/product/1bf47191dc70d9cb/mini-pk-acer-gadget-e10-etbox-1746843/"),
@@ -932,11 +2307,9 @@ def bulk_add_office_builds():
     conn.close()
     print("Офисные бюджетные ПК внесены в сборки!")
 
+@invalidates_catalog
 def bulk_add_storage():
     """Массовое добавление SSD и HDD накопителей в компоненты (накопители)"""
-    import sqlite3
-    conn = sqlite3.connect('bot_database.db')
-    cursor = conn.cursor()
     data = [
         ("1000 ГБ 2.5\" SATA накопитель Samsung 870 EVO [MZ-77E1T0BW]", 4, 0, 1, "SATA, чтение - 560 Мбайт/сек, запись - 530 Мбайт/сек, 3D NAND 3 бит MLC (TLC), TBW - 600 ТБ", "https://www.dns-shop.ru/product/49172afd28f9ed20/1000-gb-25-sata-nakopitel-samsung-870-evo-mz-77e1t0bw/"),
         ("500 ГБ 2.5\" SATA накопитель Samsung 870 EVO [MZ-77E500BW]", 4, 0, 1, "SATA, чтение - 560 Мбайт/сек, запись - 530 Мбайт/сек, 3D NAND 3 бит MLC (TLC), TBW - 300 ТБ", "https://www.dns-shop.ru/product/cd3ad695f76bed20/500-gb-25-sata-nakopitel-samsung-870-evo-mz-77e500bw/"),
@@ -961,19 +2334,12 @@ def bulk_add_storage():
         ("8 ТБ Жесткий диск Seagate SkyHawk [ST8000VX010]", 4, 0, 3, "SATA III, 6 Гбит/с, кэш память - 256 МБ, RAID Edition", "https://www.dns-shop.ru/product/3c44a7bee4d7ed20/8-tb-zestkij-disk-seagate-skyhawk-st8000vx010/"),
         ("2 ТБ Жесткий диск WD Red Plus [WD20EFPX]", 4, 0, 2, "SATA III, 6 Гбит/с, 5400 об/мин, кэш память - 64 МБ, RAID Edition", "https://www.dns-shop.ru/product/738f45d55dc0ed20/2-tb-zestkij-disk-wd-red-plus-wd20efpx/")
     ]
-    cursor.executemany("""
-        INSERT INTO components (name, category_id, price, price_category_id, description, link)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, data)
-    conn.commit()
-    conn.close()
+    add_components_bulk(dict(zip(BULK_COMPONENT_FIELDS, row)) for row in data)
     print("SSD и HDD накопители внесены в компоненты!")
 
+@invalidates_catalog
 def bulk_add_gpus_extra():
     """Массовое добавление новых видеокарт в компоненты (видеокарты)"""
-    import sqlite3
-    conn = sqlite3.connect('bot_database.db')
-    cursor = conn.cursor()
     data = [
         ("Видеокарта PNY Quadro RTX 5000 Ada Generation", 2, 0, 3, "PCIe 4.0 32 ГБ GDDR6, 256 бит, 4 x DisplayPort, GPU 1155 МГц", "https://www.dns-shop.ru/product/47e1086174aed9cb/videokarta-pny-quadro-rtx-5000-ada-generation-vcnrtx5000ada-sb/"),
         ("Видеокарта ASUS GeForce RTX 5090 ROG Astral OC Edition", 2, 0, 3, "PCIe 5.0 32 ГБ GDDR7, 512 бит, 2 x HDMI, 3 x DisplayPort, GPU 2017 МГц", "https://www.dns-shop.ru/product/ad7f908a0dd6d582/videokarta-asus-geforce-rtx-5090-rog-astral-oc-edition-rog-astral-rtx5090-o32g-gaming/"),
@@ -988,12 +2354,7 @@ def bulk_add_gpus_extra():
         ("Видеокарта ASRock Intel Arc A580 Challenger OC", 2, 0, 2, "PCIe 4.0 8 ГБ GDDR6, 256 бит, 3 x DisplayPort, HDMI, GPU 1700 МГц", "https://www.dns-shop.ru/product/b4df3eca7e2fed20/videokarta-asrock-intel-arc-a580-challenger-oc-a580-cl-8go/"),
         ("Видеокарта GIGABYTE Intel Arc A310 WINDFORCE", 2, 0, 1, "PCIe 4.0 4 ГБ GDDR6, 64 бит, 2 x DisplayPort, 2 x HDMI, GPU 2000 МГц", "https://www.dns-shop.ru/product/2acf3ace4ab7ed20/videokarta-gigabyte-intel-arc-a310-windforce-gv-ia310wf2-4gd/")
     ]
-    cursor.executemany("""
-        INSERT INTO components (name, category_id, price, price_category_id, description, link)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, data)
-    conn.commit()
-    conn.close()
+    add_components_bulk(dict(zip(BULK_COMPONENT_FIELDS, row)) for row in data)
     print("Дополнительные видеокарты внесены в компоненты!")
 
 # Инициализация БД при импорте модуля
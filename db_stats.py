@@ -0,0 +1,235 @@
+import bisect
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+
+# Сбор статистики запросов к базе (DB_STATS=0 отключает)
+DB_STATS_ENABLED = os.environ.get("DB_STATS", "1") == "1"
+# Запросы дольше порога (в миллисекундах) попадают в журнал медленных запросов
+DB_SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS", 100))
+# Сколько последних медленных запросов хранится
+DB_SLOW_LOG_SIZE = int(os.environ.get("DB_SLOW_LOG_SIZE", 100))
+# Куда и как часто (в секундах) бот сохраняет статистику для админ-консоли
+DB_STATS_FILE = os.environ.get("DB_STATS_FILE", "db_stats.json")
+DB_STATS_SAVE_INTERVAL = float(os.environ.get("DB_STATS_SAVE_INTERVAL", 60))
+
+# Границы интервалов гистограммы задержек в миллисекундах
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Текст запроса без лишних пробелов и с одинаковыми списками IN (?, ...)"""
+    sql = _WHITESPACE_RE.sub(" ", sql).strip()
+    return _IN_LIST_RE.sub("(?, ...)", sql)
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с фиксированными интервалами"""
+    __slots__ = ("counts", "count", "total_ms", "max_ms", "rows")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+
+    def add(self, elapsed_ms, rows=0):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.rows += rows
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+
+    def percentile(self, fraction):
+        """Верхняя граница интервала, в который попадает заданная доля замеров"""
+        if not self.count:
+            return 0.0
+        threshold = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= threshold:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 3),
+            "rows": self.rows,
+            "buckets": dict(zip([*map(str, LATENCY_BUCKETS_MS), "inf"], self.counts)),
+        }
+
+
+class QueryStats:
+    """Статистика обращений к базе по функциям и по тексту запросов.
+
+    Функция - это код, получивший соединение из пула: ее задержка считается
+    от получения соединения до его возврата. Ожидание пула - время выдачи
+    соединения, ожидание блокировки - время операторов, начинающих
+    пишущую транзакцию (именно на них SQLite ждет busy_timeout).
+    """
+
+    def __init__(self, slow_query_ms=DB_SLOW_QUERY_MS, slow_log_size=DB_SLOW_LOG_SIZE):
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self._functions = {}
+        self._queries = {}
+        self._pool_wait = LatencyHistogram()
+        self._lock_wait = LatencyHistogram()
+        self._slow_log = deque(maxlen=slow_log_size)
+        self._started_at = time.time()
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = LatencyHistogram()
+        return histogram
+
+    def record_function(self, name, elapsed_ms, rows=0):
+        with self._lock:
+            self._histogram(self._functions, name).add(elapsed_ms, rows)
+
+    def record_query(self, sql, elapsed_ms, rows=0):
+        with self._lock:
+            self._histogram(self._queries, normalize_sql(sql)).add(elapsed_ms, rows)
+
+    def record_pool_wait(self, elapsed_ms):
+        with self._lock:
+            self._pool_wait.add(elapsed_ms)
+
+    def record_lock_wait(self, elapsed_ms):
+        with self._lock:
+            self._lock_wait.add(elapsed_ms)
+
+    def is_slow(self, elapsed_ms):
+        return elapsed_ms >= self.slow_query_ms
+
+    def record_slow_query(self, function, sql, params, elapsed_ms, rows, plan):
+        with self._lock:
+            self._slow_log.append({
+                "ts": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "function": function,
+                "sql": normalize_sql(sql),
+                "params": repr(params)[:200],
+                "elapsed_ms": round(elapsed_ms, 3),
+                "rows": rows,
+                "plan": plan,
+            })
+
+    def snapshot(self):
+        """Вся статистика в виде словаря, пригодного для JSON"""
+        with self._lock:
+            return {
+                "started_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self._started_at)),
+                "collected_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "pid": os.getpid(),
+                "functions": {name: h.to_dict() for name, h in self._functions.items()},
+                "queries": {sql: h.to_dict() for sql, h in self._queries.items()},
+                "pool_wait": self._pool_wait.to_dict(),
+                "lock_wait": self._lock_wait.to_dict(),
+                "slow_queries": list(self._slow_log),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._functions.clear()
+            self._queries.clear()
+            self._pool_wait = LatencyHistogram()
+            self._lock_wait = LatencyHistogram()
+            self._slow_log.clear()
+            self._started_at = time.time()
+
+
+query_stats = QueryStats()
+
+
+def get_db_stats():
+    """Текущая статистика запросов этого процесса"""
+    return query_stats.snapshot()
+
+
+def reset_db_stats():
+    """Сброс статистики запросов"""
+    query_stats.reset()
+
+
+def save_db_stats(path=DB_STATS_FILE):
+    """Сохранение статистики в JSON-файл (атомарно, через временный файл)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(get_db_stats(), f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_db_stats(path=DB_STATS_FILE):
+    """Загрузка статистики, сохраненной другим процессом (None, если файла нет)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def format_db_stats(stats, top=10):
+    """Текстовый отчет: самые затратные функции и запросы, ожидания и медленные запросы"""
+    lines = [f"Статистика с {stats['started_at']} по {stats['collected_at']} (pid {stats['pid']})"]
+    for title, key in (("Функции", "functions"), ("Запросы", "queries")):
+        lines.append(f"\n{title} по суммарному времени:")
+        items = sorted(stats[key].items(), key=lambda item: item[1]["total_ms"], reverse=True)[:top]
+        for name, h in items:
+            lines.append(
+                f"  {h['total_ms']:>10.1f} мс  {h['count']:>6} раз  "
+                f"p50 {h['p50_ms']} p95 {h['p95_ms']} max {h['max_ms']} мс  строк {h['rows']}  {name[:120]}"
+            )
+    for title, key in (("Ожидание пула", "pool_wait"), ("Ожидание блокировки", "lock_wait")):
+        h = stats[key]
+        lines.append(f"\n{title}: {h['count']} раз, всего {h['total_ms']} мс, p95 {h['p95_ms']} мс, max {h['max_ms']} мс")
+    lines.append(f"\nМедленные запросы (>= {DB_SLOW_QUERY_MS} мс): {len(stats['slow_queries'])}")
+    for entry in stats["slow_queries"][-top:]:
+        lines.append(f"  {entry['ts']} {entry['elapsed_ms']} мс {entry['function']}: {entry['sql'][:120]}")
+        for detail in entry["plan"]:
+            lines.append(f"      {detail}")
+    return "\n".join(lines)
+
+
+class StatsWriter:
+    """Фоновое периодическое сохранение статистики в файл"""
+
+    def __init__(self, path=DB_STATS_FILE, interval=DB_STATS_SAVE_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                save_db_stats(self.path)
+            except OSError as e:
+                print(f"Не удалось сохранить статистику запросов: {e}")
+
+    def start(self):
+        if DB_STATS_ENABLED and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="db-stats", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            save_db_stats(self.path)
@@ -0,0 +1,5 @@
+from database import dedupe_components
+
+if __name__ == "__main__":
+    merged_count = dedupe_components()
+    print(f"Объединено дубликатов компонентов: {merged_count}")
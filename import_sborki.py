@@ -1,6 +1,6 @@
 import re
 import json
-from database import add_component, add_build, get_component_categories, get_price_categories
+from database import add_components_bulk, add_builds_bulk
 
 # Категории компонентов по ключевым словам
 CATEGORY_KEYWORDS = {
@@ -87,31 +87,34 @@ def parse_sborki(filename):
 
 def main():
     builds = parse_sborki("sborki.txt")
-    for build in builds:
-        component_ids = []
-        for comp in build["components"]:
-            price_cat_id = get_price_category_id(comp["price"])
-            comp_id = add_component(
-                name=comp["name"],
-                category_id=comp["category_id"],
-                price=comp["price"],
-                price_category_id=price_cat_id,
-                description=comp["description"],
-                specs=comp["specs"],
-                image_url=None
-            )
-            component_ids.append(comp_id)
-        # Определяем ценовую категорию сборки
-        build_price_cat = get_price_category_id(build["total_price"])
-        add_build(
-            name=build["name"],
-            device_type_id=1,  # Игровой ПК
-            price_category_id=build_price_cat,
-            description=build["description"],
-            component_ids=component_ids,
-            image_url=None,
-            link=build["link"]
-        )
+    # Все компоненты всех сборок добавляем одной транзакцией
+    components = [
+        {
+            "name": comp["name"],
+            "category_id": comp["category_id"],
+            "price": comp["price"],
+            "price_category_id": get_price_category_id(comp["price"]),
+            "description": comp["description"],
+            "specs": comp["specs"],
+            "image_url": None
+        }
+        for build in builds
+        for comp in build["components"]
+    ]
+    component_ids = iter(add_components_bulk(components))
+    # Затем одной транзакцией добавляем сборки со ссылками на эти компоненты
+    add_builds_bulk(
+        {
+            "name": build["name"],
+            "device_type_id": 1,  # Игровой ПК
+            "price_category_id": get_price_category_id(build["total_price"]),
+            "description": build["description"],
+            "component_ids": [next(component_ids) for _ in build["components"]],
+            "image_url": None,
+            "link": build["link"]
+        }
+        for build in builds
+    )
     print("Импорт сборок завершён!")
 
 if __name__ == "__main__":
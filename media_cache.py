@@ -0,0 +1,149 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from telegram.error import BadRequest
+
+from database import get_db_connection
+from async_database import run_in_db_thread
+
+# Каталог локальных изображений: относительные пути image_url ищутся в нем
+IMAGES_DIR = os.environ.get("IMAGES_DIR", "images")
+
+# Фрагменты ответов Telegram о том, что сохраненный file_id больше не годится
+_STALE_FILE_ID_ERRORS = (
+    "wrong file identifier",
+    "wrong remote file identifier",
+    "file reference",
+    "file_id",
+    "wrong padding",
+)
+
+
+class MediaCache:
+    """Кэш file_id изображений, уже загруженных в Telegram.
+
+    Ключ - адрес изображения ("url:...") или хэш содержимого локального
+    файла ("sha256:..."), так что одинаковые файлы под разными именами
+    загружаются один раз. file_id хранятся в таблице media_cache и в
+    памяти процесса.
+    """
+
+    def __init__(self):
+        self._file_ids = {}
+        # path -> (mtime, size, ключ), чтобы не пересчитывать хэш при каждой отправке
+        self._file_keys = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, image):
+        """Ключ и источник для загрузки: (key, url или путь к файлу) или None, если файла нет"""
+        if image.startswith(("http://", "https://")):
+            return f"url:{image}", image
+        path = image if os.path.isabs(image) or os.path.exists(image) else os.path.join(IMAGES_DIR, image)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._file_keys.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime, stat.st_size):
+            return cached[2], path
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        key = f"sha256:{digest.hexdigest()}"
+        with self._lock:
+            self._file_keys[path] = (stat.st_mtime, stat.st_size, key)
+        return key, path
+
+    def get(self, key):
+        """Сохраненный file_id или None"""
+        with self._lock:
+            file_id = self._file_ids.get(key)
+        if file_id is not None:
+            return file_id
+        conn = get_db_connection(readonly=True)
+        try:
+            row = conn.execute("SELECT file_id FROM media_cache WHERE key = ?", (key,)).fetchone()
+        finally:
+            conn.close()
+        if row:
+            with self._lock:
+                self._file_ids[key] = row[0]
+            return row[0]
+        return None
+
+    def store(self, key, file_id, file_unique_id=None):
+        """Сохранение file_id после загрузки изображения"""
+        conn = get_db_connection()
+        try:
+            conn.execute("""
+                INSERT INTO media_cache (key, file_id, file_unique_id, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    file_id = excluded.file_id,
+                    file_unique_id = excluded.file_unique_id,
+                    updated_at = excluded.updated_at
+            """, (key, file_id, file_unique_id, int(time.time())))
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            self._file_ids[key] = file_id
+
+    def forget(self, key, file_id):
+        """Удаление file_id, который Telegram больше не принимает"""
+        with self._lock:
+            if self._file_ids.get(key) == file_id:
+                del self._file_ids[key]
+        conn = get_db_connection()
+        try:
+            conn.execute("DELETE FROM media_cache WHERE key = ? AND file_id = ?", (key, file_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+_media_cache = MediaCache()
+
+
+def _is_stale_file_id(error):
+    """Отклонен ли запрос из-за самого file_id (а не подписи, клавиатуры и т.п.)"""
+    message = str(error).lower()
+    return any(fragment in message for fragment in _STALE_FILE_ID_ERRORS)
+
+
+async def send_photo_cached(message, image, **kwargs):
+    """Ответ на сообщение фотографией с повторным использованием file_id.
+
+    image - адрес изображения или путь к файлу (относительно IMAGES_DIR).
+    Если Telegram отклонил сохраненный file_id, фото загружается заново
+    и file_id обновляется; остальные ошибки BadRequest пробрасываются.
+    Возвращает отправленное сообщение или None, если локального файла нет.
+    """
+    resolved = await run_in_db_thread(_media_cache.resolve, image)
+    if resolved is None:
+        logging.warning("Изображение не найдено: %s", image)
+        return None
+    key, source = resolved
+    file_id = await run_in_db_thread(_media_cache.get, key)
+    if file_id is not None:
+        try:
+            return await message.reply_photo(photo=file_id, **kwargs)
+        except BadRequest as e:
+            if not _is_stale_file_id(e):
+                raise
+            logging.warning("file_id для %s отклонен (%s), изображение загружается заново", key, e)
+            await run_in_db_thread(_media_cache.forget, key, file_id)
+    if source.startswith(("http://", "https://")):
+        sent = await message.reply_photo(photo=source, **kwargs)
+    else:
+        with open(source, "rb") as f:
+            sent = await message.reply_photo(photo=f, **kwargs)
+    if sent.photo:
+        # Самый большой размер - последний в списке
+        photo = sent.photo[-1]
+        await run_in_db_thread(_media_cache.store, key, photo.file_id, photo.file_unique_id)
+    return sent
@@ -0,0 +1,654 @@
+import hashlib
+import re
+import sqlite3
+from datetime import datetime
+
+from specs import refresh_component_specs
+
+# Зарегистрированные миграции: (версия, описание, функция)
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Регистрация функции миграции схемы с указанным номером версии"""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+class SkipMigration(Exception):
+    """Миграция сейчас невыполнима (например, SQLite без нужного модуля).
+
+    Такая миграция не записывается в schema_version и повторяется
+    при следующем запуске.
+    """
+
+
+def _ensure_schema_version_table(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at TEXT
+    )
+    ''')
+
+
+def get_schema_version(conn):
+    """Получение текущей версии схемы базы данных"""
+    _ensure_schema_version_table(conn)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def get_applied_versions(conn):
+    """Версии уже примененных миграций"""
+    _ensure_schema_version_table(conn)
+    return {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+
+
+def apply_migrations(conn):
+    """Применение всех еще не выполненных миграций по порядку.
+
+    Каждая миграция выполняется в отдельной транзакции вместе с записью
+    в schema_version, поэтому упавшая миграция не оставляет схему
+    в промежуточном состоянии. Пропущенные миграции (SkipMigration) не
+    записываются и выполняются при следующем запуске, даже если более
+    поздние уже применены. Возвращает список примененных версий.
+    """
+    applied_versions = get_applied_versions(conn)
+    conn.commit()
+    applied = []
+    for version, description, func in sorted(MIGRATIONS, key=lambda item: item[0]):
+        if version in applied_versions:
+            continue
+        conn.execute("BEGIN")
+        try:
+            func(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            conn.commit()
+        except SkipMigration as e:
+            conn.rollback()
+            print(f"Миграция {version} отложена: {e}")
+            continue
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+        print(f"Применена миграция {version}: {description}")
+    return applied
+
+
+@migration(1, "Индексы для выборок сборок и компонентов")
+def _add_lookup_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pc_builds_type_price ON pc_builds (device_type_id, price_category_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_components_category_price ON components (category_id, price)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_build_components_build ON build_components (build_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_build_components_component ON build_components (component_id)")
+    conn.execute("ANALYZE")
+
+
+# Таблицы каталога, изменение которых увеличивает версию каталога
+CATALOG_TABLES = (
+    "components", "pc_builds", "build_components",
+    "device_types", "price_categories", "component_categories",
+)
+
+
+def create_catalog_version_triggers(conn, table):
+    """Создание триггеров, увеличивающих catalog_meta.version при изменении таблицы"""
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_catalog_version
+        AFTER {event} ON {table}
+        BEGIN
+            UPDATE catalog_meta SET version = version + 1 WHERE id = 1;
+        END
+        ''')
+
+
+@migration(2, "Счетчик версии каталога для инвалидации кэша")
+def _add_catalog_version(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS catalog_meta (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 1)")
+    for table in CATALOG_TABLES:
+        create_catalog_version_triggers(conn, table)
+
+
+# Счетчики каталога: (вид счетчика, таблица, колонка группировки)
+CATALOG_COUNTERS = (
+    ("builds_by_device_type", "pc_builds", "device_type_id"),
+    ("components_by_category", "components", "category_id"),
+)
+
+
+@migration(3, "Поддерживаемые триггерами счетчики сборок и компонентов")
+def _add_catalog_counts(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS catalog_counts (
+        kind TEXT NOT NULL,
+        key_id INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (kind, key_id)
+    ) WITHOUT ROWID
+    ''')
+    for kind, table, column in CATALOG_COUNTERS:
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_insert_count
+        AFTER INSERT ON {table}
+        WHEN NEW.{column} IS NOT NULL
+        BEGIN
+            INSERT OR IGNORE INTO catalog_counts (kind, key_id, count) VALUES ('{kind}', NEW.{column}, 0);
+            UPDATE catalog_counts SET count = count + 1 WHERE kind = '{kind}' AND key_id = NEW.{column};
+        END
+        ''')
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_delete_count
+        AFTER DELETE ON {table}
+        WHEN OLD.{column} IS NOT NULL
+        BEGIN
+            UPDATE catalog_counts SET count = count - 1 WHERE kind = '{kind}' AND key_id = OLD.{column};
+        END
+        ''')
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_update_count
+        AFTER UPDATE OF {column} ON {table}
+        WHEN OLD.{column} IS NOT NEW.{column}
+        BEGIN
+            UPDATE catalog_counts SET count = count - 1 WHERE kind = '{kind}' AND key_id = OLD.{column};
+            INSERT OR IGNORE INTO catalog_counts (kind, key_id, count)
+            SELECT '{kind}', NEW.{column}, 0 WHERE NEW.{column} IS NOT NULL;
+            UPDATE catalog_counts SET count = count + 1 WHERE kind = '{kind}' AND key_id = NEW.{column};
+        END
+        ''')
+        conn.execute("DELETE FROM catalog_counts WHERE kind = ?", (kind,))
+        conn.execute(f'''
+        INSERT INTO catalog_counts (kind, key_id, count)
+        SELECT ?, {column}, COUNT(*) FROM {table}
+        WHERE {column} IS NOT NULL
+        GROUP BY {column}
+        ''', (kind,))
+
+
+def fts5_available(conn):
+    """Проверка, собран ли SQLite с поддержкой FTS5"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(value)")
+        conn.execute("DROP TABLE temp._fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+@migration(4, "Полнотекстовый индекс FTS5 для page_data")
+def _add_page_data_fts(conn):
+    if not fts5_available(conn):
+        # Без FTS5 поиск по страницам продолжит работать через LIKE
+        raise SkipMigration("SQLite собран без FTS5, полнотекстовый индекс page_data не создан")
+    conn.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS page_data_fts USING fts5(
+        url, page_text,
+        content='page_data', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_page_data_fts_insert AFTER INSERT ON page_data
+    BEGIN
+        INSERT INTO page_data_fts (rowid, url, page_text) VALUES (NEW.id, NEW.url, NEW.page_text);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_page_data_fts_delete AFTER DELETE ON page_data
+    BEGIN
+        INSERT INTO page_data_fts (page_data_fts, rowid, url, page_text) VALUES ('delete', OLD.id, OLD.url, OLD.page_text);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_page_data_fts_update AFTER UPDATE ON page_data
+    BEGIN
+        INSERT INTO page_data_fts (page_data_fts, rowid, url, page_text) VALUES ('delete', OLD.id, OLD.url, OLD.page_text);
+        INSERT INTO page_data_fts (rowid, url, page_text) VALUES (NEW.id, NEW.url, NEW.page_text);
+    END
+    ''')
+    conn.execute("INSERT INTO page_data_fts (page_data_fts) VALUES ('rebuild')")
+
+
+# Запрос, заполняющий catalog_fts по компонентам и сборкам.
+# rowid кодирует источник: id * 2 для компонентов, id * 2 + 1 для сборок
+CATALOG_FTS_FILL_SQL = '''
+INSERT INTO catalog_fts (rowid, kind, ref_id, name, description, specs)
+SELECT id * 2, 'component', id, name, description, specs FROM components
+UNION ALL
+SELECT id * 2 + 1, 'build', id, name, description, NULL FROM pc_builds
+'''
+
+
+@migration(5, "Полнотекстовый индекс FTS5 для компонентов и сборок")
+def _add_catalog_fts(conn):
+    if not fts5_available(conn):
+        raise SkipMigration("SQLite собран без FTS5, полнотекстовый индекс каталога не создан")
+    # prefix-индексы ускоряют поиск по началу слова ("5600" найдет "5600X")
+    conn.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5(
+        kind UNINDEXED, ref_id UNINDEXED, name, description, specs,
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_components_fts_insert AFTER INSERT ON components
+    BEGIN
+        INSERT INTO catalog_fts (rowid, kind, ref_id, name, description, specs)
+        VALUES (NEW.id * 2, 'component', NEW.id, NEW.name, NEW.description, NEW.specs);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_components_fts_update
+    AFTER UPDATE OF id, name, description, specs ON components
+    BEGIN
+        DELETE FROM catalog_fts WHERE rowid = OLD.id * 2;
+        INSERT INTO catalog_fts (rowid, kind, ref_id, name, description, specs)
+        VALUES (NEW.id * 2, 'component', NEW.id, NEW.name, NEW.description, NEW.specs);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_components_fts_delete AFTER DELETE ON components
+    BEGIN
+        DELETE FROM catalog_fts WHERE rowid = OLD.id * 2;
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_pc_builds_fts_insert AFTER INSERT ON pc_builds
+    BEGIN
+        INSERT INTO catalog_fts (rowid, kind, ref_id, name, description, specs)
+        VALUES (NEW.id * 2 + 1, 'build', NEW.id, NEW.name, NEW.description, NULL);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_pc_builds_fts_update
+    AFTER UPDATE OF id, name, description ON pc_builds
+    BEGIN
+        DELETE FROM catalog_fts WHERE rowid = OLD.id * 2 + 1;
+        INSERT INTO catalog_fts (rowid, kind, ref_id, name, description, specs)
+        VALUES (NEW.id * 2 + 1, 'build', NEW.id, NEW.name, NEW.description, NULL);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_pc_builds_fts_delete AFTER DELETE ON pc_builds
+    BEGIN
+        DELETE FROM catalog_fts WHERE rowid = OLD.id * 2 + 1;
+    END
+    ''')
+    conn.execute(CATALOG_FTS_FILL_SQL)
+
+
+_DNS_PRODUCT_RE = re.compile(r"dns-shop\.ru/product/([0-9a-f]+)", re.IGNORECASE)
+
+
+def component_natural_key(name, category_id, link=None):
+    """Естественный ключ компонента.
+
+    Для товаров DNS это id товара из ссылки, для остальных - хэш
+    нормализованного названия в пределах категории.
+    """
+    match = _DNS_PRODUCT_RE.search(link or "")
+    if match:
+        return f"dns:{match.group(1).lower()}"
+    normalized = " ".join((name or "").lower().replace("ё", "е").split())
+    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+    return f"name:{category_id}:{digest}"
+
+
+def merge_duplicate_components(conn):
+    """Слияние компонентов с одинаковым естественным ключом.
+
+    Остается компонент с наименьшим id, пустые поля которого дополняются
+    данными дубликатов. Связи build_components переводятся на него,
+    дубликаты удаляются. Возвращает количество удаленных дубликатов.
+    """
+    rows = conn.execute("SELECT id, name, category_id, link FROM components WHERE natural_key IS NULL").fetchall()
+    conn.executemany(
+        "UPDATE components SET natural_key = ? WHERE id = ?",
+        [(component_natural_key(row[1], row[2], row[3]), row[0]) for row in rows]
+    )
+    conn.execute("DROP TABLE IF EXISTS temp._component_merge")
+    conn.execute('''
+    CREATE TEMP TABLE _component_merge AS
+    SELECT c.id AS duplicate_id, k.keep_id
+    FROM components c
+    JOIN (
+        SELECT natural_key, MIN(id) AS keep_id FROM components
+        WHERE natural_key IS NOT NULL
+        GROUP BY natural_key HAVING COUNT(*) > 1
+    ) k ON k.natural_key = c.natural_key AND c.id <> k.keep_id
+    ''')
+    conn.execute('''
+    UPDATE components SET
+        price = CASE WHEN COALESCE(components.price, 0) = 0 THEN merged.price ELSE components.price END,
+        description = COALESCE(NULLIF(components.description, ''), merged.description),
+        specs = COALESCE(components.specs, merged.specs),
+        image_url = COALESCE(components.image_url, merged.image_url),
+        link = COALESCE(NULLIF(components.link, ''), merged.link)
+    FROM (
+        SELECT m.keep_id, MAX(d.price) AS price, MAX(NULLIF(d.description, '')) AS description,
+               MAX(d.specs) AS specs, MAX(d.image_url) AS image_url, MAX(NULLIF(d.link, '')) AS link
+        FROM _component_merge m JOIN components d ON d.id = m.duplicate_id
+        GROUP BY m.keep_id
+    ) AS merged
+    WHERE components.id = merged.keep_id
+    ''')
+    conn.execute('''
+    UPDATE build_components SET component_id = m.keep_id
+    FROM _component_merge m
+    WHERE build_components.component_id = m.duplicate_id
+    ''')
+    merged_count = conn.execute(
+        "DELETE FROM components WHERE id IN (SELECT duplicate_id FROM _component_merge)"
+    ).rowcount
+    conn.execute("DROP TABLE temp._component_merge")
+    return merged_count
+
+
+@migration(6, "Естественный ключ компонентов и слияние дубликатов")
+def _add_component_natural_key(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(components)")]
+    if "natural_key" not in columns:
+        conn.execute("ALTER TABLE components ADD COLUMN natural_key TEXT")
+    merged_count = merge_duplicate_components(conn)
+    if merged_count:
+        print(f"Объединено дубликатов компонентов: {merged_count}")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_components_natural_key ON components (natural_key)")
+
+
+# Связи сборок с компонентами удаляются вместе со сборкой или компонентом
+BUILD_COMPONENTS_SQL = '''
+CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY,
+    build_id INTEGER,
+    component_id INTEGER,
+    FOREIGN KEY (build_id) REFERENCES pc_builds (id) ON DELETE CASCADE,
+    FOREIGN KEY (component_id) REFERENCES components (id) ON DELETE CASCADE
+)
+'''
+
+
+@migration(7, "Каскадное удаление связей сборок с компонентами")
+def _add_build_components_cascade(conn):
+    # Связи, указывающие на несуществующие сборки или компоненты, не пройдут проверку ключей
+    deleted_count = conn.execute('''
+    DELETE FROM build_components
+    WHERE build_id NOT IN (SELECT id FROM pc_builds)
+       OR component_id NOT IN (SELECT id FROM components)
+    ''').rowcount
+    if deleted_count:
+        print(f"Удалено висячих связей сборок с компонентами: {deleted_count}")
+    on_delete = {row[2]: row[6] for row in conn.execute("PRAGMA foreign_key_list(build_components)")}
+    if on_delete and all(action == "CASCADE" for action in on_delete.values()):
+        return
+    # SQLite не умеет менять внешние ключи, поэтому таблица пересоздается
+    conn.execute(BUILD_COMPONENTS_SQL.format(table="build_components_new"))
+    conn.execute('''
+    INSERT INTO build_components_new (id, build_id, component_id)
+    SELECT id, build_id, component_id FROM build_components
+    ''')
+    conn.execute("DROP TABLE build_components")
+    conn.execute("ALTER TABLE build_components_new RENAME TO build_components")
+    # Индексы и триггеры удалились вместе со старой таблицей
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_build_components_build ON build_components (build_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_build_components_component ON build_components (component_id)")
+    create_catalog_version_triggers(conn, "build_components")
+
+
+@migration(8, "Индексируемые характеристики компонентов")
+def _add_component_specs(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS component_specs (
+        component_id INTEGER NOT NULL,
+        key TEXT NOT NULL,
+        value_num REAL,
+        value_text TEXT,
+        FOREIGN KEY (component_id) REFERENCES components (id) ON DELETE CASCADE
+    )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_component_specs_component ON component_specs (component_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_component_specs_text ON component_specs (key, value_text, component_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_component_specs_num ON component_specs (key, value_num, component_id)")
+    spec_count = refresh_component_specs(conn)
+    print(f"Извлечено характеристик компонентов: {spec_count}")
+
+
+# Источники цен в price_history: (колонка ссылки, таблица, колонка цены)
+PRICE_HISTORY_SOURCES = (
+    ("component_id", "components", "price"),
+    ("build_id", "pc_builds", "total_price"),
+)
+
+
+@migration(9, "История цен компонентов и сборок")
+def _add_price_history(conn):
+    # Цены хранятся в копейках, строка добавляется только при изменении цены
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS price_history (
+        id INTEGER PRIMARY KEY,
+        component_id INTEGER REFERENCES components (id) ON DELETE CASCADE,
+        build_id INTEGER REFERENCES pc_builds (id) ON DELETE CASCADE,
+        ts INTEGER NOT NULL,
+        price_kop INTEGER NOT NULL,
+        source TEXT,
+        CHECK ((component_id IS NULL) != (build_id IS NULL))
+    )
+    ''')
+    for column, table, price_column in PRICE_HISTORY_SOURCES:
+        # Покрывающий индекс: история и последняя цена читаются без обращения к таблице
+        conn.execute(f'''
+        CREATE INDEX IF NOT EXISTS idx_price_history_{column[:-3]}
+        ON price_history ({column}, ts, price_kop) WHERE {column} IS NOT NULL
+        ''')
+        last_price = f"""(
+            SELECT price_kop FROM price_history
+            WHERE {column} = NEW.id ORDER BY ts DESC, id DESC LIMIT 1
+        )"""
+        for event in ("INSERT", f"UPDATE OF {price_column}"):
+            conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.split()[0].lower()}_price_history
+            AFTER {event} ON {table}
+            WHEN NEW.{price_column} > 0 AND NEW.{price_column} * 100 IS NOT {last_price}
+            BEGIN
+                INSERT INTO price_history ({column}, ts, price_kop, source)
+                VALUES (NEW.id, CAST(strftime('%s', 'now') AS INTEGER), NEW.{price_column} * 100, 'catalog');
+            END
+            ''')
+        conn.execute(f'''
+        INSERT INTO price_history ({column}, ts, price_kop, source)
+        SELECT id, CAST(strftime('%s', 'now') AS INTEGER), {price_column} * 100, 'catalog'
+        FROM {table} WHERE {price_column} > 0
+        ''')
+
+
+@migration(10, "Индекс для постраничного вывода сборок по цене")
+def _add_builds_keyset_index(conn):
+    # Новый индекс покрывает и выборку по типу и ценовой категории, старый не нужен
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_pc_builds_type_price_total
+    ON pc_builds (device_type_id, price_category_id, total_price)
+    ''')
+    conn.execute("DROP INDEX IF EXISTS idx_pc_builds_type_price")
+
+
+@migration(11, "Сохраняемые сессии навигации пользователей")
+def _add_user_sessions(conn):
+    # state - JSON с состоянием навигации, updated_at - unix-время последнего изменения
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS user_sessions (
+        user_id INTEGER PRIMARY KEY,
+        state TEXT NOT NULL,
+        updated_at INTEGER NOT NULL
+    )
+    ''')
+    # Индекс для удаления устаревших сессий
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_sessions_updated_at ON user_sessions (updated_at)")
+
+
+@migration(12, "Кэш file_id загруженных в Telegram изображений")
+def _add_media_cache(conn):
+    # key - "url:<адрес>" или "sha256:<хэш файла>", file_id - идентификатор фото в Telegram
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS media_cache (
+        key TEXT PRIMARY KEY,
+        file_id TEXT NOT NULL,
+        file_unique_id TEXT,
+        updated_at INTEGER NOT NULL
+    )
+    ''')
+
+
+
+_SUGGESTIONS_USER_FK = re.compile(
+    r"FOREIGN\s+KEY\s*\(\s*user_id\s*\)\s*REFERENCES\s+users\s*\(\s*user_id\s*\)"
+    r"(\s+ON\s+DELETE\s+(SET\s+NULL|SET\s+DEFAULT|CASCADE|RESTRICT|NO\s+ACTION))?",
+    re.IGNORECASE,
+)
+
+
+def _suggestions_cascade_sql(table_sql):
+    """CREATE TABLE для suggestions_new: те же столбцы, внешний ключ с ON DELETE CASCADE"""
+    cascade = "FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE"
+    if _SUGGESTIONS_USER_FK.search(table_sql):
+        table_sql = _SUGGESTIONS_USER_FK.sub(cascade, table_sql, count=1)
+    else:
+        end = table_sql.rindex(")")
+        table_sql = f"{table_sql[:end].rstrip()},\n    {cascade}\n{table_sql[end:]}"
+    return re.sub(r'^CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?"?suggestions"?', "CREATE TABLE suggestions_new",
+                  table_sql, count=1, flags=re.IGNORECASE)
+
+
+@migration(13, "Каскадное удаление предложений вместе с пользователем")
+def _add_suggestions_cascade(conn):
+    # Предложения пользователей, которых нет в users, не пройдут проверку ключей.
+    # Чтобы не терять сами предложения, для их авторов заводятся записи users
+    # без имени с датой регистрации, равной дате предложения
+    placeholder_count = conn.execute('''
+    INSERT OR IGNORE INTO users (user_id, registration_date, last_active)
+    SELECT user_id, MIN(created_at), MAX(created_at) FROM suggestions
+    WHERE user_id IS NOT NULL AND user_id NOT IN (SELECT user_id FROM users)
+    GROUP BY user_id
+    ''').rowcount
+    if placeholder_count:
+        print(f"Добавлено пользователей-заглушек для предложений без автора: {placeholder_count}")
+    on_delete = {row[2]: row[6] for row in conn.execute("PRAGMA foreign_key_list(suggestions)")}
+    if on_delete.get("users") != "CASCADE":
+        # SQLite не умеет менять внешние ключи, поэтому таблица пересоздается
+        # с прежними определениями столбцов, меняется только внешний ключ
+        table_sql = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'suggestions'"
+        ).fetchone()[0]
+        conn.execute(_suggestions_cascade_sql(table_sql))
+        conn.execute("INSERT INTO suggestions_new SELECT * FROM suggestions")
+        conn.execute("DROP TABLE suggestions")
+        conn.execute("ALTER TABLE suggestions_new RENAME TO suggestions")
+    # Индекс по внешнему ключу: без него каскадное удаление просматривает всю таблицу
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_suggestions_user ON suggestions (user_id)")
+
+
+@migration(14, "Индексы постраничного вывода с ценой NULL как 0")
+def _add_keyset_coalesce_indexes(conn):
+    # Ключ страниц - COALESCE(цена, 0), иначе записи без цены не попадают ни на одну страницу
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_components_category_price_key
+    ON components (category_id, COALESCE(price, 0))
+    ''')
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_pc_builds_type_price_total_key
+    ON pc_builds (device_type_id, price_category_id, COALESCE(total_price, 0))
+    ''')
+    # Новый индекс сборок покрывает и выборку по типу и ценовой категории
+    conn.execute("DROP INDEX IF EXISTS idx_pc_builds_type_price_total")
+
+# Запросы из горячих путей и индексы, которые они должны использовать
+QUERY_PLAN_CHECKS = [
+    (
+        "get_builds_by_type_and_price",
+        "SELECT * FROM pc_builds WHERE device_type_id = ? AND price_category_id = ?",
+        (1, 1),
+        "idx_pc_builds_type_price_total_key",
+    ),
+    (
+        "get_builds_page",
+        "SELECT id, name, total_price FROM pc_builds WHERE device_type_id = ? AND price_category_id = ? "
+        "AND (COALESCE(total_price, 0), id) > (?, ?) ORDER BY COALESCE(total_price, 0), id LIMIT ?",
+        (1, 1, 0, 0, 11),
+        "idx_pc_builds_type_price_total_key",
+    ),
+    (
+        "get_components_page",
+        "SELECT id, name, price FROM components WHERE category_id = ? "
+        "AND (COALESCE(price, 0), id) > (?, ?) ORDER BY COALESCE(price, 0), id LIMIT ?",
+        (1, 0, 0, 11),
+        "idx_components_category_price_key",
+    ),
+    (
+        "get_components_by_category",
+        "SELECT * FROM components WHERE category_id = ? ORDER BY price",
+        (1,),
+        "idx_components_category_price",
+    ),
+    (
+        "get_build_details",
+        "SELECT c.* FROM components c JOIN build_components bc ON c.id = bc.component_id WHERE bc.build_id = ?",
+        (1,),
+        "idx_build_components_build",
+    ),
+    (
+        "build_components по компоненту",
+        "SELECT build_id FROM build_components WHERE component_id = ?",
+        (1,),
+        "idx_build_components_component",
+    ),
+    (
+        "find_components по значению",
+        "SELECT component_id FROM component_specs WHERE key = ? AND value_text IN (?)",
+        ("socket", "AM4"),
+        "idx_component_specs_text",
+    ),
+    (
+        "find_components по диапазону",
+        "SELECT component_id FROM component_specs WHERE key = ? AND value_num <= ?",
+        ("tdp", 65),
+        "idx_component_specs_num",
+    ),
+    (
+        "история цен компонента",
+        "SELECT ts, price_kop FROM price_history WHERE component_id = ? ORDER BY ts DESC LIMIT 10",
+        (1,),
+        "idx_price_history_component",
+    ),
+]
+
+
+def explain_query_plan(conn, sql, params=()):
+    """Получение плана выполнения запроса в виде списка строк"""
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+
+def check_query_plans(conn):
+    """Проверка, что запросы из горячих путей используют свои индексы.
+
+    Возвращает список (название, план) для запросов, план которых
+    не содержит ожидаемого индекса.
+    """
+    problems = []
+    for name, sql, params, index_name in QUERY_PLAN_CHECKS:
+        plan = explain_query_plan(conn, sql, params)
+        if not any(index_name in detail for detail in plan):
+            problems.append((name, plan))
+    return problems
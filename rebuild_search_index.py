@@ -0,0 +1,7 @@
+from database import rebuild_page_data_index, rebuild_catalog_index
+
+if __name__ == "__main__":
+    if rebuild_page_data_index():
+        print("Полнотекстовый индекс страниц перестроен")
+    if rebuild_catalog_index():
+        print("Полнотекстовый индекс компонентов и сборок перестроен")
@@ -1,10 +1,12 @@
 import os
-from database import init_db
+from database import init_db, close_db_connections
 
 def recreate_database():
     """Пересоздание базы данных"""
     # Удаляем существующую базу данных
     if os.path.exists("bot_database.db"):
+        # Соединения пула держат файл открытым, закрываем их перед удалением
+        close_db_connections()
         os.remove("bot_database.db")
         print("Старая база данных удалена")
     
@@ -0,0 +1,212 @@
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from database import (
+    get_catalog_version, get_device_types, get_price_categories, get_component_categories,
+    get_build_counts_by_device_type, get_component_counts_by_category,
+    get_builds_page, get_components_page
+)
+
+# Сколько готовых экранов хранится в памяти
+SCREEN_CACHE_SIZE = int(os.environ.get("SCREEN_CACHE_SIZE", 2000))
+
+# Готовый экран бота: текст, клавиатура и признак пустого списка
+Screen = namedtuple("Screen", ("text", "reply_markup", "empty"))
+
+
+class ScreenCache:
+    """Кэш готовых экранов навигации.
+
+    Ключ - (screen, device_type_id, price_category_id, category_id, page).
+    Экраны строятся из каталога, поэтому весь кэш сбрасывается при смене
+    версии каталога. Клавиатуры telegram неизменяемы и выдаются без
+    копирования, так что повторное нажатие кнопки не обращается к базе.
+    """
+
+    def __init__(self, max_size=SCREEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, key, builder):
+        """Экран из кэша или его построение через builder"""
+        version = get_catalog_version()
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._entries.clear()
+            screen = self._entries.get(key)
+            if screen is not None:
+                self._entries.move_to_end(key)
+                return screen
+        screen = builder()
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = screen
+                if len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return screen
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_screen_cache = ScreenCache()
+
+
+def _back_button(callback_data):
+    return [InlineKeyboardButton("⬅️ Назад", callback_data=callback_data)]
+
+
+def _format_price(value):
+    return "{:,}".format(value).replace(",", " ")
+
+
+def _price_category_text(price_category):
+    if price_category['name'].lower().startswith('бюджет'):
+        return f"{price_category['name']} (до {_format_price(price_category['max_price'])} тыс. ₽)"
+    return (
+        f"{price_category['name']} (от {_format_price(price_category['min_price'])} "
+        f"до {_format_price(price_category['max_price'])} ₽)"
+    )
+
+
+def _page_navigation(prefix, page):
+    """Кнопки перехода к соседним страницам списка.
+
+    В callback_data передается ключ (цена, id) крайней записи страницы:
+    p - листать назад от первой записи, n - вперед от последней.
+    """
+    navigation = []
+    if page["prev"]:
+        price, item_id = page["prev"]
+        navigation.append(InlineKeyboardButton("⬅️ Пред.", callback_data=f"{prefix}_p_{price}_{item_id}"))
+    if page["next"]:
+        price, item_id = page["next"]
+        navigation.append(InlineKeyboardButton("След. ➡️", callback_data=f"{prefix}_n_{price}_{item_id}"))
+    return navigation
+
+
+def _build_device_types():
+    device_types = get_device_types()
+    builds_count = get_build_counts_by_device_type()
+    keyboard = [
+        [InlineKeyboardButton(
+            f"{device_type['name']} ({builds_count.get(device_type['id'], 0)})",
+            callback_data=f"device_type_{device_type['id']}"
+        )]
+        for device_type in device_types
+    ]
+    keyboard.append(_back_button("back_to_main"))
+    return Screen("Выберите тип устройства:", InlineKeyboardMarkup(keyboard), not device_types)
+
+
+def _build_price_categories(device_type_id):
+    device_types = get_device_types()
+    device_type_name = next((d['name'].lower() for d in device_types if d['id'] == device_type_id), "")
+    price_categories = get_price_categories()
+    if device_type_name.startswith('офис'):
+        # Для офисного ПК только бюджетный
+        price_categories = [p for p in price_categories if p['name'].lower().startswith('бюджет')]
+    keyboard = [
+        [InlineKeyboardButton(_price_category_text(price_category), callback_data=f"price_category_{price_category['id']}")]
+        for price_category in price_categories
+    ]
+    keyboard.append(_back_button("back_to_device"))
+    return Screen("Выберите ценовую категорию:", InlineKeyboardMarkup(keyboard), not price_categories)
+
+
+def _build_component_categories():
+    component_categories = get_component_categories()
+    components_count = get_component_counts_by_category()
+    keyboard = [
+        [InlineKeyboardButton(
+            f"{category['name']} ({components_count.get(category['id'], 0)})",
+            callback_data=f"component_category_{category['id']}"
+        )]
+        for category in component_categories
+    ]
+    keyboard.append(_back_button("back_to_main"))
+    return Screen("Выберите категорию компонентов:", InlineKeyboardMarkup(keyboard), not component_categories)
+
+
+def _build_builds_page(device_type_id, price_category_id, after, before):
+    page = get_builds_page(device_type_id, price_category_id, after=after, before=before)
+    if not page["items"]:
+        return Screen(
+            "К сожалению, сборок по заданным параметрам не найдено.",
+            InlineKeyboardMarkup([_back_button("back_to_price")]),
+            True
+        )
+    keyboard = [
+        [InlineKeyboardButton(f"{build['name']}", callback_data=f"build_{build['id']}")]
+        for build in page["items"]
+    ]
+    navigation = _page_navigation(f"bpage_{device_type_id}_{price_category_id}", page)
+    if navigation:
+        keyboard.append(navigation)
+    keyboard.append(_back_button("back_to_price"))
+    return Screen("Доступные сборки:", InlineKeyboardMarkup(keyboard), False)
+
+
+def _build_components_page(category_id, after, before):
+    page = get_components_page(category_id, after=after, before=before)
+    if not page["items"]:
+        return Screen(
+            "К сожалению, компонентов в данной категории не найдено.",
+            InlineKeyboardMarkup([_back_button("back_to_categories")]),
+            True
+        )
+    keyboard = [
+        [InlineKeyboardButton(f"{component['name']}", callback_data=f"component_{component['id']}")]
+        for component in page["items"]
+    ]
+    navigation = _page_navigation(f"cpage_{category_id}", page)
+    if navigation:
+        keyboard.append(navigation)
+    keyboard.append(_back_button("back_to_categories"))
+    return Screen("Доступные компоненты:", InlineKeyboardMarkup(keyboard), False)
+
+
+def get_device_types_screen():
+    """Экран выбора типа устройства"""
+    return _screen_cache.get(("device_types", None, None, None, None), _build_device_types)
+
+
+def get_price_categories_screen(device_type_id):
+    """Экран выбора ценовой категории для типа устройства"""
+    return _screen_cache.get(
+        ("price_categories", device_type_id, None, None, None),
+        lambda: _build_price_categories(device_type_id)
+    )
+
+
+def get_component_categories_screen():
+    """Экран выбора категории компонентов"""
+    return _screen_cache.get(("component_categories", None, None, None, None), _build_component_categories)
+
+
+def get_builds_screen(device_type_id, price_category_id, after=None, before=None):
+    """Страница списка сборок; after/before - ключ (цена, id) для листания"""
+    return _screen_cache.get(
+        ("builds", device_type_id, price_category_id, None, (after, before)),
+        lambda: _build_builds_page(device_type_id, price_category_id, after, before)
+    )
+
+
+def get_components_screen(category_id, after=None, before=None):
+    """Страница списка компонентов категории; after/before - ключ (цена, id) для листания"""
+    return _screen_cache.get(
+        ("components", None, None, category_id, (after, before)),
+        lambda: _build_components_page(category_id, after, before)
+    )
+
+
+def clear_screen_cache():
+    """Сброс кэша экранов"""
+    _screen_cache.clear()
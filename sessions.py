@@ -0,0 +1,189 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from database import get_db_connection
+
+# Сколько сессий держится в памяти (остальные читаются из базы по запросу)
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", 50000))
+# Через сколько секунд без изменений сессия считается устаревшей
+SESSION_TTL = int(os.environ.get("SESSION_TTL", 7 * 24 * 3600))
+# Как часто (в секундах) и при каком числе изменений сессии записываются в базу
+SESSION_FLUSH_INTERVAL = float(os.environ.get("SESSION_FLUSH_INTERVAL", 5))
+SESSION_FLUSH_SIZE = int(os.environ.get("SESSION_FLUSH_SIZE", 500))
+# Как часто (в секундах) из базы удаляются устаревшие сессии
+SESSION_PURGE_INTERVAL = float(os.environ.get("SESSION_PURGE_INTERVAL", 3600))
+
+
+class SessionStore:
+    """Хранилище состояний навигации пользователей.
+
+    В памяти держится не больше max_size последних сессий (LRU), сессии
+    старше ttl секунд не выдаются. Изменения копятся и записываются в
+    таблицу user_sessions одной транзакцией раз в flush_interval секунд
+    или при накоплении flush_size изменений, поэтому после перезапуска
+    бота пользователь продолжает с того же экрана.
+    """
+
+    def __init__(self, max_size=SESSION_CACHE_SIZE, ttl=SESSION_TTL,
+                 flush_interval=SESSION_FLUSH_INTERVAL, flush_size=SESSION_FLUSH_SIZE,
+                 purge_interval=SESSION_PURGE_INTERVAL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.purge_interval = purge_interval
+        # user_id -> (state, updated_at), порядок - от давно использованных к недавним
+        self._entries = OrderedDict()
+        # user_id -> (state в JSON, updated_at), еще не записанные в базу
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._timer = None
+        self._purged_at = None
+
+    def _expired(self, updated_at, now):
+        return updated_at < now - self.ttl
+
+    def _remember(self, user_id, state, updated_at):
+        self._entries[user_id] = (state, updated_at)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _schedule_flush(self):
+        """Запуск таймера записи (вызывается под self._lock)"""
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            print(f"Не удалось записать сессии пользователей, повтор через {self.flush_interval} с: {e}")
+
+    def _load(self, user_id):
+        conn = get_db_connection(readonly=True)
+        try:
+            row = conn.execute(
+                "SELECT state, updated_at FROM user_sessions WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def get(self, user_id):
+        """Копия состояния пользователя (пустой словарь, если сессии нет)"""
+        now = int(time.time())
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None and user_id in self._pending:
+                # Сессия вытеснена из памяти, но еще не записана в базу
+                state, updated_at = self._pending[user_id]
+                entry = (json.loads(state), updated_at)
+        if entry is None:
+            entry = self._load(user_id) or ({}, now)
+        with self._lock:
+            if user_id in self._entries:
+                # Пока читали базу, сессию могли изменить
+                entry = self._entries[user_id]
+            if self._expired(entry[1], now):
+                entry = ({}, now)
+            self._remember(user_id, entry[0], entry[1])
+        return dict(entry[0])
+
+    def _store(self, user_id, state):
+        now = int(time.time())
+        with self._lock:
+            self._remember(user_id, state, now)
+            self._pending[user_id] = (json.dumps(state, ensure_ascii=False), now)
+            should_flush = len(self._pending) >= self.flush_size
+            if not should_flush:
+                self._schedule_flush()
+        if should_flush:
+            self.flush()
+
+    def update(self, user_id, **values):
+        """Изменение отдельных полей состояния пользователя"""
+        state = self.get(user_id)
+        state.update(values)
+        self._store(user_id, state)
+
+    def reset(self, user_id, **values):
+        """Замена состояния пользователя новым"""
+        self._store(user_id, dict(values))
+
+    def flush(self):
+        """Запись накопленных изменений и удаление устаревших сессий из базы.
+
+        Если запись не удалась, изменения возвращаются в очередь (более новые,
+        накопленные за это время, не затираются) и запись повторяется по таймеру.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        now = int(time.time())
+        should_purge = self._purged_at is None or now - self._purged_at >= self.purge_interval
+        if not pending and not should_purge:
+            return 0
+        conn = get_db_connection()
+        try:
+            conn.executemany("""
+                INSERT INTO user_sessions (user_id, state, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at
+                WHERE excluded.updated_at >= user_sessions.updated_at
+            """, [(user_id, state, updated_at) for user_id, (state, updated_at) in pending.items()])
+            if should_purge:
+                conn.execute("DELETE FROM user_sessions WHERE updated_at < ?", (now - self.ttl,))
+            conn.commit()
+            if should_purge:
+                self._purged_at = now
+        except BaseException:
+            conn.rollback()
+            with self._lock:
+                for user_id, (state, updated_at) in pending.items():
+                    queued = self._pending.get(user_id)
+                    if queued is None or queued[1] < updated_at:
+                        self._pending[user_id] = (state, updated_at)
+                self._schedule_flush()
+            raise
+        finally:
+            conn.close()
+        return len(pending)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_session_store = SessionStore()
+
+
+def get_session(user_id):
+    """Состояние навигации пользователя"""
+    return _session_store.get(user_id)
+
+
+def update_session(user_id, **values):
+    """Изменение полей состояния навигации пользователя"""
+    _session_store.update(user_id, **values)
+
+
+def reset_session(user_id, **values):
+    """Начало новой сессии пользователя с заданными полями"""
+    _session_store.reset(user_id, **values)
+
+
+def flush_sessions():
+    """Принудительная запись накопленных изменений сессий"""
+    return _session_store.flush()
+
+
+atexit.register(flush_sessions)
@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import threading
+
+from database import (
+    get_db_connection, CATALOG_SNAPSHOT_FILE, CATALOG_SNAPSHOT_ENABLED
+)
+
+# Как часто (в секундах) фоновый поток сверяет версию снимка с основной базой
+CATALOG_SNAPSHOT_INTERVAL = float(os.environ.get("CATALOG_SNAPSHOT_INTERVAL", 5))
+
+# Таблицы, которые попадают в снимок (вместе со служебными таблицами catalog_fts)
+SNAPSHOT_TABLES = (
+    "components", "pc_builds", "build_components",
+    "device_types", "price_categories", "component_categories",
+    "component_specs", "catalog_meta", "catalog_counts", "catalog_fts",
+)
+
+_publish_lock = threading.Lock()
+
+
+def _read_version(conn):
+    row = conn.execute("SELECT version FROM catalog_meta WHERE id = 1").fetchone()
+    return row[0] if row else None
+
+
+def _strip_snapshot(path):
+    """Удаление из копии базы всего, что не относится к каталогу"""
+    conn = sqlite3.connect(path)
+    try:
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+            conn.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+        tables = conn.execute("""
+            SELECT name, sql LIKE 'CREATE VIRTUAL TABLE%' FROM sqlite_master
+            WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+            ORDER BY 2 DESC
+        """).fetchall()
+        # Виртуальные таблицы удаляются первыми вместе со своими служебными таблицами
+        for name, _ in tables:
+            if name in SNAPSHOT_TABLES or name.startswith("catalog_fts_"):
+                continue
+            conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+        conn.commit()
+        # Читатели открывают снимок с immutable=1, журнал WAL им не нужен
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def publish_snapshot(path=CATALOG_SNAPSHOT_FILE):
+    """Публикация снимка каталога в отдельный файл только для чтения.
+
+    Копия делается VACUUM INTO (согласованное состояние без блокировки
+    писателей), очищается от некаталожных таблиц и атомарно подменяет
+    прежний снимок через os.replace. Возвращает версию каталога в снимке.
+    """
+    tmp_path = f"{path}.tmp"
+    with _publish_lock:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = get_db_connection()
+        try:
+            conn.execute("VACUUM INTO ?", (tmp_path,))
+        finally:
+            conn.close()
+        _strip_snapshot(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            version = _read_version(conn)
+        finally:
+            conn.close()
+        os.replace(tmp_path, path)
+    return version
+
+
+def get_snapshot_version(path=CATALOG_SNAPSHOT_FILE):
+    """Версия каталога в опубликованном снимке (None, если снимка нет)"""
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(f"file:{path}?immutable=1", uri=True)
+    try:
+        return _read_version(conn)
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+def refresh_snapshot(path=CATALOG_SNAPSHOT_FILE):
+    """Перепубликация снимка, если каталог в основной базе изменился.
+
+    Возвращает версию нового снимка или None, если снимок актуален.
+    """
+    conn = get_db_connection(readonly=True)
+    try:
+        version = _read_version(conn)
+    finally:
+        conn.close()
+    if version is not None and version == get_snapshot_version(path):
+        return None
+    return publish_snapshot(path)
+
+
+class SnapshotRefresher:
+    """Фоновый поток, поддерживающий снимок каталога в актуальном состоянии"""
+
+    def __init__(self, interval=CATALOG_SNAPSHOT_INTERVAL, path=CATALOG_SNAPSHOT_FILE):
+        self.interval = interval
+        self.path = path
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                version = refresh_snapshot(self.path)
+            except (sqlite3.Error, OSError) as e:
+                print(f"Не удалось обновить снимок каталога: {e}")
+                continue
+            if version is not None:
+                print(f"Опубликован снимок каталога версии {version}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="catalog-snapshot", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_refresher = None
+
+
+def start_snapshot_refresher():
+    """Публикация снимка и запуск его фонового обновления, если снимок включен"""
+    global _refresher
+    if not CATALOG_SNAPSHOT_ENABLED:
+        return None
+    version = publish_snapshot()
+    if _refresher is None:
+        _refresher = SnapshotRefresher()
+        _refresher.start()
+    return version
+
+
+def stop_snapshot_refresher():
+    """Остановка фонового обновления снимка"""
+    global _refresher
+    if _refresher is not None:
+        _refresher.stop()
+        _refresher = None
+
+
+if __name__ == "__main__":
+    print(f"Опубликован снимок каталога версии {publish_snapshot()}: {CATALOG_SNAPSHOT_FILE}")
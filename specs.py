@@ -0,0 +1,135 @@
+import json
+import re
+
+# Категории компонентов (component_categories.id)
+CPU_CATEGORY_ID = 1
+GPU_CATEGORY_ID = 2
+RAM_CATEGORY_ID = 3
+MOTHERBOARD_CATEGORY_ID = 5
+PSU_CATEGORY_ID = 6
+COOLER_CATEGORY_ID = 7
+
+# Категории, для которых из текста извлекаются сокеты, тип и объем памяти
+SOCKET_CATEGORIES = (CPU_CATEGORY_ID, MOTHERBOARD_CATEGORY_ID, COOLER_CATEGORY_ID)
+MEMORY_TYPE_CATEGORIES = (RAM_CATEGORY_ID, MOTHERBOARD_CATEGORY_ID)
+MEMORY_SIZE_CATEGORIES = (GPU_CATEGORY_ID, RAM_CATEGORY_ID)
+
+_SOCKET_RE = re.compile(r"\b(AM[2-5]\+?|FM2\+?|LGA\s?\d{3,4}|sTRX4|sTR5|TR4|SP3)(?![\w+])", re.IGNORECASE)
+_MEMORY_TYPE_RE = re.compile(r"(?<![A-Za-z])(DDR[2-5])\b", re.IGNORECASE)
+_MEMORY_SIZE_RE = re.compile(r"(\d+)\s*ГБ")
+_TDP_RE = re.compile(r"TDP\s*[-:]?\s*(\d+)\s*(?:Вт|W)\b", re.IGNORECASE)
+_WATTAGE_RE = re.compile(r"(\d{3,4})\s*(?:Вт|W)\b")
+_NUMBER_RE = re.compile(r"^\s*(\d+(?:[.,]\d+)?)")
+
+# Названия характеристик из specs, которые приводятся к общим ключам
+SPEC_KEY_ALIASES = {
+    "сокет": "socket",
+    "тип памяти": "memory_type",
+    "объем памяти": "memory_gb",
+    "тепловыделение": "tdp",
+    "мощность": "wattage",
+}
+
+# Ключи, значения которых хранятся в верхнем регистре для точного сравнения
+_UPPERCASE_KEYS = ("socket", "memory_type")
+
+
+def normalize_spec_key(key):
+    """Приведение названия характеристики к общему ключу"""
+    key = " ".join(str(key).lower().split())
+    return SPEC_KEY_ALIASES.get(key, key)
+
+
+def normalize_spec_value(key, value):
+    """Значение характеристики в виде (value_num, value_text)"""
+    text = " ".join(str(value).split())
+    if key == "socket":
+        text = text.replace(" ", "")
+    if key in _UPPERCASE_KEYS:
+        text = text.upper()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value), text
+    match = _NUMBER_RE.match(text)
+    return (float(match.group(1).replace(",", ".")) if match else None), text
+
+
+def extract_component_specs(name, category_id, description=None, specs=None):
+    """Извлечение характеристик компонента из specs и текстового описания.
+
+    Возвращает список (key, value_num, value_text) без повторов. У одного
+    ключа может быть несколько значений, например сокеты кулера.
+    """
+    attributes = []
+
+    def add(key, value):
+        value_num, value_text = normalize_spec_value(key, value)
+        if value_text and (key, value_num, value_text) not in attributes:
+            attributes.append((key, value_num, value_text))
+
+    if isinstance(specs, str):
+        try:
+            specs = json.loads(specs) if specs.strip() else None
+        except json.JSONDecodeError:
+            specs = None
+    if isinstance(specs, dict):
+        for key, value in specs.items():
+            key = normalize_spec_key(key)
+            if key == "link" or value is None or isinstance(value, (dict, list)):
+                continue
+            add(key, value)
+
+    text = f"{name or ''}\n{description or ''}"
+    if category_id in SOCKET_CATEGORIES:
+        for socket in _SOCKET_RE.findall(text):
+            add("socket", socket)
+    if category_id in MEMORY_TYPE_CATEGORIES:
+        for memory_type in _MEMORY_TYPE_RE.findall(text):
+            add("memory_type", memory_type)
+    if category_id in MEMORY_SIZE_CATEGORIES:
+        match = _MEMORY_SIZE_RE.search(text)
+        if match:
+            add("memory_gb", int(match.group(1)))
+    match = _TDP_RE.search(text)
+    if match:
+        add("tdp", int(match.group(1)))
+    if category_id == PSU_CATEGORY_ID:
+        match = _WATTAGE_RE.search(text)
+        if match:
+            add("wattage", int(match.group(1)))
+    return attributes
+
+
+def refresh_component_specs(conn, component_ids=None):
+    """Пересчет строк component_specs для указанных компонентов (или для всех).
+
+    Выполняется в текущей транзакции соединения, фиксацию делает вызывающий.
+    Возвращает количество записанных характеристик.
+    """
+    if component_ids is None:
+        conn.execute("DELETE FROM component_specs")
+        rows = conn.execute("SELECT id, name, category_id, description, specs FROM components").fetchall()
+    else:
+        component_ids = list(component_ids)
+        if not component_ids:
+            return 0
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS _spec_component_ids (id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM temp._spec_component_ids")
+        conn.executemany(
+            "INSERT OR IGNORE INTO temp._spec_component_ids (id) VALUES (?)",
+            [(component_id,) for component_id in component_ids]
+        )
+        conn.execute("DELETE FROM component_specs WHERE component_id IN (SELECT id FROM temp._spec_component_ids)")
+        rows = conn.execute("""
+            SELECT id, name, category_id, description, specs FROM components
+            WHERE id IN (SELECT id FROM temp._spec_component_ids)
+        """).fetchall()
+    spec_rows = [
+        (row[0], key, value_num, value_text)
+        for row in rows
+        for key, value_num, value_text in extract_component_specs(row[1], row[2], row[3], row[4])
+    ]
+    conn.executemany(
+        "INSERT INTO component_specs (component_id, key, value_num, value_text) VALUES (?, ?, ?, ?)",
+        spec_rows
+    )
+    return len(spec_rows)
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# database.py при импорте создает bot_database.db в текущем каталоге,
+# поэтому тесты работают во временном каталоге со свежей базой
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="pc_bot_tests_"))
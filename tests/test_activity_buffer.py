@@ -0,0 +1,46 @@
+import sqlite3
+
+import pytest
+
+import database
+
+
+def _last_active(user_id):
+    conn = database.get_db_connection()
+    try:
+        return conn.execute("SELECT last_active FROM users WHERE user_id = ?", (user_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_flush_writes_last_active():
+    database.register_user(1001, "user", "User", None)
+    buffer = database.ActivityBuffer(flush_interval=3600, flush_size=1000)
+    buffer.touch(1001)
+    assert buffer.flush() == 1
+    assert _last_active(1001) is not None
+
+
+def test_failed_flush_keeps_pending(monkeypatch):
+    database.register_user(1002, "user", "User", None)
+    buffer = database.ActivityBuffer(flush_interval=3600, flush_size=1000)
+    buffer.touch(1002)
+
+    class FailingConnection:
+        def executemany(self, *args):
+            raise sqlite3.OperationalError("database is locked")
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(database, "get_db_connection", lambda readonly=False: FailingConnection())
+    with pytest.raises(sqlite3.OperationalError):
+        buffer.flush()
+    monkeypatch.undo()
+    # Отметка вернулась в буфер и записывается следующей попыткой
+    assert buffer.flush() == 1
+    assert _last_active(1002) is not None
+    assert buffer.flush() == 0
@@ -0,0 +1,28 @@
+import database
+
+
+def test_bulk_builds_return_ids_of_inserted_rows():
+    component_ids = database.add_components_bulk([
+        {"name": "Процессор для массовой вставки", "category_id": 1, "price": 10000},
+        {"name": "Видеокарта для массовой вставки", "category_id": 2, "price": 30000},
+    ])
+    build_ids = database.add_builds_bulk([
+        {"name": "Массовая сборка 1", "device_type_id": 1, "price_category_id": 1,
+         "component_ids": component_ids[:1]},
+        {"name": "Массовая сборка 2", "device_type_id": 1, "price_category_id": 1,
+         "component_ids": component_ids},
+    ])
+    conn = database.get_db_connection()
+    try:
+        names = [conn.execute("SELECT name FROM pc_builds WHERE id = ?", (build_id,)).fetchone()[0]
+                 for build_id in build_ids]
+        links = [
+            [row[0] for row in conn.execute(
+                "SELECT component_id FROM build_components WHERE build_id = ? ORDER BY component_id", (build_id,)
+            )]
+            for build_id in build_ids
+        ]
+    finally:
+        conn.close()
+    assert names == ["Массовая сборка 1", "Массовая сборка 2"]
+    assert links == [component_ids[:1], sorted(component_ids)]
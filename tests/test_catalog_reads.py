@@ -0,0 +1,39 @@
+import json
+
+import database
+
+
+def _json_loads_counter(monkeypatch):
+    calls = []
+    original = json.loads
+
+    def counting_loads(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(database.json, "loads", counting_loads)
+    return calls
+
+
+def test_component_details_parse_specs_once(monkeypatch):
+    component_id = database.upsert_component(
+        "Процессор для теста specs", 1, 12000, 1, specs={"Сокет": "AM4"}
+    )
+    calls = _json_loads_counter(monkeypatch)
+    first = database.get_component_details(component_id)
+    second = database.get_component_details(component_id)
+    assert first["specs"] == second["specs"] == {"Сокет": "AM4"}
+    assert len(calls) == 1
+    assert database.get_component_specs(component_id)["socket"] == ["AM4"]
+
+
+def test_random_build_parses_specs_once(monkeypatch):
+    component_id = database.upsert_component(
+        "Видеокарта для теста specs", 2, 30000, 1, specs={"Объем памяти": "8 ГБ"}
+    )
+    build_id = database.add_build("Сборка для теста specs", 1, 1, component_ids=[component_id])
+    calls = _json_loads_counter(monkeypatch)
+    for _ in range(3):
+        build = database._get_build_with_components(build_id)
+    assert build["components"][0]["specs"] == {"Объем памяти": "8 ГБ"}
+    assert len(calls) == 1
@@ -0,0 +1,29 @@
+import database
+from db_stats import query_stats
+
+
+def _query_counts():
+    return {sql: h["count"] for sql, h in query_stats.snapshot()["queries"].items()}
+
+
+def test_point_lookups_are_recorded():
+    component_id = database.upsert_component("Компонент для статистики", 3, 4000, 1)
+    database.invalidate_catalog_cache()
+    query_stats.reset()
+    assert database.get_component_details(component_id)["id"] == component_id
+    counts = _query_counts()
+    assert counts.get("SELECT * FROM components WHERE id = ?") == 1
+    assert counts.get("SELECT version FROM catalog_meta WHERE id = 1") == 1
+    functions = query_stats.snapshot()["functions"]
+    assert functions["database.get_component_details"]["rows"] == 1
+
+
+def test_slow_point_lookup_is_logged(monkeypatch):
+    monkeypatch.setattr(query_stats, "slow_query_ms", 0)
+    query_stats.reset()
+    conn = database.get_db_connection()
+    conn.execute("SELECT name FROM components WHERE id = ?", (1,)).fetchone()
+    conn.close()
+    slow = query_stats.snapshot()["slow_queries"]
+    assert [entry["sql"] for entry in slow] == ["SELECT name FROM components WHERE id = ?"]
+    assert slow[0]["plan"]
@@ -0,0 +1,30 @@
+import database
+
+
+def _count(sql, params=()):
+    conn = database.get_db_connection()
+    try:
+        return conn.execute(sql, params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_suggestion_from_unregistered_user():
+    suggestion_id = database.add_suggestion(999999999, "Добавьте ноутбуки")
+    assert suggestion_id
+    assert _count("SELECT COUNT(*) FROM users WHERE user_id = ?", (999999999,)) == 1
+
+
+def test_purge_user_removes_suggestions():
+    database.register_user(2001, "user", "User", None)
+    database.add_suggestion(2001, "Предложение")
+    assert database.purge("users", "user_id = ?", (2001,)) == 1
+    assert _count("SELECT COUNT(*) FROM suggestions WHERE user_id = ?", (2001,)) == 0
+
+
+def test_delete_build_removes_links():
+    component_id = database.upsert_component("Тестовый процессор AM5", 1, 15000, 1)
+    build_id = database.add_build("Тестовая сборка", 1, 1, component_ids=[component_id])
+    assert _count("SELECT COUNT(*) FROM build_components WHERE build_id = ?", (build_id,)) == 1
+    database.delete_build(build_id)
+    assert _count("SELECT COUNT(*) FROM build_components WHERE build_id = ?", (build_id,)) == 0
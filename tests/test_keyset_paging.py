@@ -0,0 +1,54 @@
+import database
+
+
+def _walk_forward(category_id, limit):
+    pages, after = [], None
+    while True:
+        page = database.get_components_page(category_id, after=after, limit=limit)
+        pages.append(page)
+        if page["next"] is None:
+            return pages
+        after = page["next"]
+
+
+def _add_components(category_id):
+    ids = [database.upsert_component(f"Компонент для теста страниц {price}", category_id, price, 1)
+           for price in (5000, 1000, 3000, 1000, 9000)]
+    conn = database.get_db_connection()
+    try:
+        cursor = conn.execute(
+            "INSERT INTO components (name, category_id, price, price_category_id) VALUES (?, ?, NULL, 1)",
+            ("Компонент без цены", category_id),
+        )
+        ids.append(cursor.lastrowid)
+        conn.commit()
+    finally:
+        conn.close()
+    return ids
+
+
+def test_pages_cover_all_components_including_null_price():
+    category_id = 3
+    ids = _add_components(category_id)
+    pages = _walk_forward(category_id, limit=1)
+    seen = [item["id"] for page in pages for item in page["items"]]
+    assert len(seen) == len(set(seen))
+    assert set(ids) <= set(seen)
+    keys = [((item["price"] or 0), item["id"]) for page in pages for item in page["items"]]
+    assert keys == sorted(keys)
+    # Курсор записи без цены - числа, которые переживают callback_data
+    for page in pages:
+        if page["next"] is not None:
+            assert all(isinstance(value, int) for value in page["next"])
+
+
+def test_backward_pages_match_forward_pages():
+    category_id = 4
+    _add_components(category_id)
+    pages = _walk_forward(category_id, limit=2)
+    before = pages[-1]["prev"]
+    for expected in reversed(pages[:-1]):
+        page = database.get_components_page(category_id, before=before, limit=2)
+        assert page["items"] == expected["items"]
+        before = page["prev"]
+    assert before is None
@@ -0,0 +1,52 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("telegram")
+
+from telegram.error import BadRequest
+
+import media_cache
+
+IMAGE_URL = "https://example.com/build.png"
+
+
+class FakeMessage:
+    def __init__(self, rejected_file_id_error=None):
+        self.rejected_file_id_error = rejected_file_id_error
+        self.sent = []
+
+    async def reply_photo(self, photo, **kwargs):
+        self.sent.append(photo)
+        if photo != IMAGE_URL and self.rejected_file_id_error:
+            raise BadRequest(self.rejected_file_id_error)
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=f"id-{len(self.sent)}", file_unique_id="u")])
+
+
+@pytest.fixture
+def cached_file_id(monkeypatch):
+    monkeypatch.setattr(media_cache, "_media_cache", media_cache.MediaCache())
+    media_cache._media_cache.store(f"url:{IMAGE_URL}", "old-id")
+    return "old-id"
+
+
+def test_cached_file_id_is_reused(cached_file_id):
+    message = FakeMessage()
+    asyncio.run(media_cache.send_photo_cached(message, IMAGE_URL))
+    assert message.sent == [cached_file_id]
+
+
+def test_stale_file_id_is_forgotten_and_reuploaded(cached_file_id):
+    message = FakeMessage("Wrong file identifier/http url specified")
+    asyncio.run(media_cache.send_photo_cached(message, IMAGE_URL))
+    assert message.sent == [cached_file_id, IMAGE_URL]
+    assert media_cache._media_cache.get(f"url:{IMAGE_URL}") == "id-2"
+
+
+def test_other_bad_request_is_raised_and_file_id_kept(cached_file_id):
+    message = FakeMessage("Can't parse entities: can't find end of the entity")
+    with pytest.raises(BadRequest):
+        asyncio.run(media_cache.send_photo_cached(message, IMAGE_URL, caption="*"))
+    assert message.sent == [cached_file_id]
+    assert media_cache._media_cache.get(f"url:{IMAGE_URL}") == cached_file_id
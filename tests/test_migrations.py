@@ -0,0 +1,109 @@
+import sqlite3
+
+import migrations
+
+
+def test_skipped_migration_is_retried(monkeypatch):
+    available = {"fts": False}
+
+    def optional(conn):
+        if not available["fts"]:
+            raise migrations.SkipMigration("нет модуля")
+        conn.execute("CREATE TABLE optional_table (id INTEGER)")
+
+    def regular(conn):
+        conn.execute("CREATE TABLE regular_table (id INTEGER)")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [(1, "optional", optional), (2, "regular", regular)])
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    assert migrations.apply_migrations(conn) == [2]
+    assert migrations.get_applied_versions(conn) == {2}
+    # После появления модуля отложенная миграция применяется, хотя более поздняя уже есть
+    available["fts"] = True
+    assert migrations.apply_migrations(conn) == [1]
+    assert migrations.get_applied_versions(conn) == {1, 2}
+    conn.execute("SELECT * FROM optional_table")
+
+
+def test_fts_migration_skipped_without_fts5(monkeypatch):
+    monkeypatch.setattr(migrations, "fts5_available", lambda conn: False)
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    conn.execute("CREATE TABLE page_data (id INTEGER PRIMARY KEY, url TEXT, page_text TEXT)")
+    monkeypatch.setattr(migrations, "MIGRATIONS", [
+        item for item in migrations.MIGRATIONS if item[0] == 4
+    ])
+    assert migrations.apply_migrations(conn) == []
+    assert migrations.get_applied_versions(conn) == set()
+
+
+def test_catalog_fts_migration_skipped_without_fts5(monkeypatch):
+    monkeypatch.setattr(migrations, "fts5_available", lambda conn: False)
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    monkeypatch.setattr(migrations, "MIGRATIONS", [
+        item for item in migrations.MIGRATIONS if item[0] == 5
+    ])
+    assert migrations.apply_migrations(conn) == []
+    assert migrations.get_applied_versions(conn) == set()
+
+
+def _apply_suggestions_cascade(monkeypatch, suggestions_sql):
+    monkeypatch.setattr(migrations, "MIGRATIONS", [
+        item for item in migrations.MIGRATIONS if item[0] == 13
+    ])
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    conn.execute("CREATE TABLE users (user_id INTEGER PRIMARY KEY, registration_date TEXT, last_active TEXT)")
+    conn.execute(suggestions_sql)
+    conn.execute("INSERT INTO users (user_id) VALUES (1)")
+    conn.execute("INSERT INTO suggestions (user_id, suggestion_text, created_at) VALUES (1, 'a', '2024-01-01')")
+    conn.execute("INSERT INTO suggestions (user_id, suggestion_text, created_at) VALUES (2, 'b', '2024-02-01')")
+    assert migrations.apply_migrations(conn) == [13]
+    return conn
+
+
+def _table_sql(conn):
+    return conn.execute("SELECT sql FROM sqlite_master WHERE name = 'suggestions'").fetchone()[0]
+
+
+def test_suggestions_cascade_keeps_column_definitions(monkeypatch):
+    conn = _apply_suggestions_cascade(monkeypatch, """
+        CREATE TABLE IF NOT EXISTS suggestions (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            suggestion_text TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            status TEXT
+        )
+    """)
+    columns = [row[1:] for row in conn.execute("PRAGMA table_info(suggestions)")]
+    assert columns == [
+        ("id", "INTEGER", 0, None, 1),
+        ("user_id", "INTEGER", 0, None, 0),
+        ("suggestion_text", "TEXT", 0, None, 0),
+        ("created_at", "TEXT", 0, "CURRENT_TIMESTAMP", 0),
+        ("status", "TEXT", 0, None, 0),
+    ]
+    assert "AUTOINCREMENT" not in _table_sql(conn)
+    assert [row[6] for row in conn.execute("PRAGMA foreign_key_list(suggestions)")] == ["CASCADE"]
+    # Автор предложения без записи в users получил запись-заглушку
+    assert conn.execute("SELECT registration_date FROM users WHERE user_id = 2").fetchone() == ("2024-02-01",)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("DELETE FROM users WHERE user_id = 2")
+    assert conn.execute("SELECT user_id FROM suggestions").fetchall() == [(1,)]
+
+
+def test_suggestions_cascade_replaces_existing_foreign_key(monkeypatch):
+    conn = _apply_suggestions_cascade(monkeypatch, """
+        CREATE TABLE suggestions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            suggestion_text TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'new',
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    """)
+    table_sql = _table_sql(conn)
+    assert "AUTOINCREMENT" in table_sql and "DEFAULT 'new'" in table_sql
+    assert table_sql.count("FOREIGN KEY") == 1
+    assert [row[6] for row in conn.execute("PRAGMA foreign_key_list(suggestions)")] == ["CASCADE"]
+    assert conn.execute("SELECT COUNT(*) FROM suggestions").fetchone() == (2,)
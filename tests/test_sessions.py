@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+
+import sessions
+
+
+def _store(**kwargs):
+    kwargs.setdefault("flush_interval", 3600)
+    kwargs.setdefault("flush_size", 1000)
+    return sessions.SessionStore(**kwargs)
+
+
+def test_lru_keeps_max_size_sessions_in_memory():
+    store = _store(max_size=2)
+    for user_id in (2001, 2002, 2003):
+        store.update(user_id, screen="main")
+    assert len(store) == 2
+    # Вытесненная сессия еще не записана в базу, но читается из очереди
+    assert store.get(2001) == {"screen": "main"}
+
+
+def test_expired_session_is_reset(monkeypatch):
+    store = _store(ttl=60)
+    store.update(2011, screen="builds")
+    monkeypatch.setattr(sessions.time, "time", lambda: 10 ** 10)
+    assert store.get(2011) == {}
+
+
+def test_sessions_survive_new_store():
+    store = _store()
+    store.update(2021, screen="components", page=3)
+    assert store.flush() == 1
+    assert _store().get(2021) == {"screen": "components", "page": 3}
+
+
+def test_failed_flush_requeues_sessions(monkeypatch):
+    store = _store()
+    store.update(2031, screen="search")
+    store.update(2032, screen="builds")
+
+    class FailingConnection:
+        def executemany(self, *args):
+            raise sqlite3.OperationalError("database is locked")
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(sessions, "get_db_connection", lambda readonly=False: FailingConnection())
+    with pytest.raises(sqlite3.OperationalError):
+        store.flush()
+    monkeypatch.undo()
+    # Изменение, сделанное после неудачной записи, не затирается старым
+    store.update(2031, screen="help")
+    assert store.flush() == 2
+    assert _store().get(2031) == {"screen": "help"}
+    assert _store().get(2032) == {"screen": "builds"}
+    assert store.flush() == 0
@@ -0,0 +1,25 @@
+import database
+import snapshot
+
+
+def _page_names(category_id):
+    page = database.get_components_page(category_id, limit=1000)
+    return {item["name"] for item in page["items"]}
+
+
+def test_write_is_visible_before_snapshot_refresh(monkeypatch):
+    monkeypatch.setattr(database, "CATALOG_SNAPSHOT_ENABLED", True)
+    snapshot.publish_snapshot(database.CATALOG_SNAPSHOT_FILE)
+    assert "Снимок: новый компонент" not in _page_names(7)
+
+    database.upsert_component("Снимок: новый компонент", 7, 2500, 1)
+    # Снимок еще старый, поэтому чтение идет из основной базы, а не кэширует устаревшие данные
+    assert "Снимок: новый компонент" in _page_names(7)
+
+    snapshot.publish_snapshot(database.CATALOG_SNAPSHOT_FILE)
+    conn = database.get_catalog_connection()
+    try:
+        assert isinstance(conn._conn, database.SnapshotConnection)
+    finally:
+        conn.close()
+    assert "Снимок: новый компонент" in _page_names(7)
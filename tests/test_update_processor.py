@@ -0,0 +1,78 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("telegram.ext")
+
+from update_processor import ChatOrderedUpdateProcessor
+
+
+def _update(chat_id):
+    return SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id), effective_user=None)
+
+
+def test_final_process_update_is_not_overridden():
+    assert "process_update" not in ChatOrderedUpdateProcessor.__dict__
+
+
+def test_updates_of_one_chat_run_in_order_and_chats_run_concurrently():
+    events = []
+
+    async def handler(name, delay):
+        events.append(("start", name))
+        await asyncio.sleep(delay)
+        events.append(("end", name))
+
+    async def scenario():
+        processor = ChatOrderedUpdateProcessor(max_concurrent_updates=4)
+        await asyncio.gather(
+            processor.process_update(_update(1), handler("a1", 0.05)),
+            processor.process_update(_update(1), handler("a2", 0)),
+            processor.process_update(_update(2), handler("b1", 0)),
+        )
+        return processor
+
+    processor = asyncio.run(scenario())
+    # Второе обновление чата 1 начинается только после первого
+    assert events.index(("end", "a1")) < events.index(("start", "a2"))
+    # Чат 2 не ждет медленное обновление чата 1
+    assert events.index(("end", "b1")) < events.index(("end", "a1"))
+    stats = processor.stats()
+    assert stats["processed"] == 3
+    assert stats["pending"] == stats["active"] == stats["chats"] == 0
+
+
+def test_burst_from_one_chat_does_not_delay_other_chats():
+    async def handler(delay):
+        await asyncio.sleep(delay)
+
+    async def scenario():
+        processor = ChatOrderedUpdateProcessor(max_concurrent_updates=4)
+        loop = asyncio.get_running_loop()
+        tasks = [asyncio.ensure_future(processor.process_update(_update(1), handler(0.2))) for _ in range(4)]
+        # Пачка чата 1 уже в процессоре, когда приходит обновление чата 2
+        await asyncio.sleep(0)
+        started = loop.time()
+        await processor.process_update(_update(2), handler(0))
+        waited = loop.time() - started
+        await asyncio.gather(*tasks)
+        return processor, waited
+
+    processor, waited = asyncio.run(scenario())
+    assert waited < 0.1
+    assert processor.peak_active <= 4
+
+
+def test_concurrency_limit_is_enforced_after_chat_order():
+    async def handler():
+        await asyncio.sleep(0.01)
+
+    async def scenario():
+        processor = ChatOrderedUpdateProcessor(max_concurrent_updates=2)
+        await asyncio.gather(*(processor.process_update(_update(chat_id), handler()) for chat_id in range(10)))
+        return processor
+
+    processor = asyncio.run(scenario())
+    assert processor.peak_active == 2
+    assert processor.processed == 10
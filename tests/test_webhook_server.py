@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("telegram")
+
+import webhook_server
+
+
+class FakeBot:
+    def __init__(self, token="123:token"):
+        self.token = token
+        self.webhooks = []
+
+    async def set_webhook(self, **kwargs):
+        self.webhooks.append(kwargs)
+
+
+class FakeApplication:
+    def __init__(self):
+        self.bot = FakeBot()
+        self.update_queue = asyncio.Queue()
+        self.update_processor = None
+        self.running = True
+        self.post_init = None
+        self.post_shutdown = None
+
+    async def initialize(self):
+        pass
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
+def test_over_limit_connection_gets_503_without_sending_request():
+    async def scenario():
+        server = webhook_server.WebhookServer(
+            FakeApplication(), host="127.0.0.1", port=0, max_connections=0, idle_timeout=60
+        )
+        server._server = await asyncio.start_server(server._handle_connection, "127.0.0.1", 0)
+        port = server._server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            # Запрос не отправляется: ответ должен прийти, не дожидаясь его
+            response = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+        finally:
+            await server.stop()
+        return server, response
+
+    server, response = asyncio.run(scenario())
+    assert response.startswith(b"HTTP/1.1 503")
+    assert server.requests_rejected == 1
+
+
+def test_webhook_is_registered_with_secret_derived_from_token(monkeypatch):
+    class Started(Exception):
+        pass
+
+    class FakeServer:
+        path = "/telegram"
+        secret_token = ""
+        max_connections = 40
+
+        async def start(self):
+            raise Started()
+
+    monkeypatch.setattr(webhook_server, "WEBHOOK_URL", "https://example.com")
+    secrets = []
+    # Два экземпляра бота с одним токеном регистрируют один и тот же секрет
+    for _ in range(2):
+        application = FakeApplication()
+        server = FakeServer()
+        with pytest.raises(Started):
+            asyncio.run(webhook_server.serve_webhook(application, server))
+        secret = application.bot.webhooks[0]["secret_token"]
+        assert secret and secret == server.secret_token
+        secrets.append(secret)
+    assert secrets[0] == secrets[1]
+    assert secrets[0] != webhook_server.derive_secret_token("456:other")
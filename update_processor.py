@@ -0,0 +1,108 @@
+import asyncio
+import os
+
+from telegram.ext import BaseUpdateProcessor
+
+# Сколько обновлений обрабатывается одновременно (1 - строго по очереди)
+BOT_CONCURRENCY = int(os.environ.get("BOT_CONCURRENCY", 16))
+# Лимит python-telegram-bot: он только пропускает обновления к процессору,
+# настоящий лимит BOT_CONCURRENCY соблюдается после очереди чата
+_PTB_CONCURRENCY_LIMIT = 1 << 20
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка обновлений с сохранением порядка внутри чата.
+
+    Обновления разных чатов обрабатываются одновременно (не больше
+    concurrency), обновления одного чата - строго по очереди, поэтому
+    нажатия пользователя применяются в том порядке, в каком пришли, и не
+    гонятся за его сессию.
+
+    process_update в python-telegram-bot помечен @final и занимает слот до
+    вызова do_process_update, поэтому его лимит задается заведомо большим,
+    а слоты concurrency выдает собственный семафор уже после блокировки
+    чата. Обновления, ждущие своей очереди в чате, слотов не занимают, и
+    пачка обновлений одного чата не задерживает остальные чаты.
+    """
+
+    def __init__(self, max_concurrent_updates=BOT_CONCURRENCY):
+        super().__init__(_PTB_CONCURRENCY_LIMIT)
+        self.concurrency = max_concurrent_updates
+        # Создается при первом обновлении, уже внутри цикла событий
+        self._slots = None
+        # chat_id -> [блокировка, число обновлений чата в обработке и в очереди]
+        self._chats = {}
+        # Обновления в процессоре: всего, прошедшие очередь своего чата, выполняемые обработчиками
+        self._pending = 0
+        self._ordered = 0
+        self._active = 0
+        self.processed = 0
+        self.peak_pending = 0
+        self.peak_active = 0
+
+    @staticmethod
+    def _chat_key(update):
+        chat = getattr(update, "effective_chat", None)
+        if chat is not None:
+            return chat.id
+        user = getattr(update, "effective_user", None)
+        return user.id if user is not None else None
+
+    async def do_process_update(self, update, coroutine):
+        self._pending += 1
+        self.peak_pending = max(self.peak_pending, self._pending)
+        try:
+            key = self._chat_key(update)
+            if key is None:
+                # Обновления без чата и пользователя порядка не требуют
+                await self._run(coroutine)
+                return
+            entry = self._chats.get(key)
+            if entry is None:
+                entry = self._chats[key] = [asyncio.Lock(), 0]
+            entry[1] += 1
+            try:
+                async with entry[0]:
+                    await self._run(coroutine)
+            finally:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._chats[key]
+        finally:
+            self._pending -= 1
+            self.processed += 1
+
+    async def _run(self, coroutine):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        self._ordered += 1
+        try:
+            async with self._slots:
+                self._active += 1
+                self.peak_active = max(self.peak_active, self._active)
+                try:
+                    await coroutine
+                finally:
+                    self._active -= 1
+        finally:
+            self._ordered -= 1
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def stats(self):
+        """Глубина очередей: ждут своей очереди в чате, ждут свободного слота, выполняются"""
+        return {
+            "concurrency": self.concurrency,
+            "pending": self._pending,
+            "queued_in_chats": self._pending - self._ordered,
+            "waiting_for_slot": self._ordered - self._active,
+            "active": self._active,
+            "chats": len(self._chats),
+            "processed": self.processed,
+            "peak_pending": self.peak_pending,
+            "peak_active": self.peak_active,
+        }
@@ -0,0 +1,267 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import signal
+import time
+
+from telegram import Update
+
+# Адрес, на котором слушает встроенный HTTP-сервер
+WEBHOOK_HOST = os.environ.get("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", 8443))
+# Путь, на который Telegram присылает обновления
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "/telegram")
+# Внешний адрес вебхука для setWebhook (без него вебхук не регистрируется,
+# что удобно для локальной проверки записанными обновлениями)
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")
+# Секрет из заголовка X-Telegram-Bot-Api-Secret-Token (пустой - без проверки;
+# при регистрации вебхука пустой секрет выводится из токена бота, одинаково
+# во всех экземплярах)
+WEBHOOK_SECRET_TOKEN = os.environ.get("WEBHOOK_SECRET_TOKEN", "")
+# Сколько соединений одновременно принимает сервер и сколько разрешено Telegram
+WEBHOOK_MAX_CONNECTIONS = int(os.environ.get("WEBHOOK_MAX_CONNECTIONS", 40))
+# Максимальный размер тела запроса в байтах
+WEBHOOK_MAX_BODY_SIZE = int(os.environ.get("WEBHOOK_MAX_BODY_SIZE", 1024 * 1024))
+# Через сколько секунд закрывается простаивающее соединение
+WEBHOOK_IDLE_TIMEOUT = float(os.environ.get("WEBHOOK_IDLE_TIMEOUT", 60))
+# Сколько секунд отклоненное соединение дочитывается перед закрытием
+WEBHOOK_REJECT_LINGER = float(os.environ.get("WEBHOOK_REJECT_LINGER", 1))
+
+HEALTH_PATH = "/healthz"
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 503: "Service Unavailable",
+}
+
+
+class BadRequest(Exception):
+    """Запрос, который не удалось разобрать"""
+
+    def __init__(self, status=400):
+        super().__init__(status)
+        self.status = status
+
+
+class WebhookServer:
+    """Встроенный HTTP-сервер для приема обновлений Telegram.
+
+    POST на path с верным секретом разбирается в Update и кладется в
+    очередь приложения, GET /healthz отдает состояние сервера в JSON.
+    Соединения сверх max_connections сразу получают 503 и закрываются.
+    """
+
+    def __init__(self, application, host=WEBHOOK_HOST, port=WEBHOOK_PORT, path=WEBHOOK_PATH,
+                 secret_token=WEBHOOK_SECRET_TOKEN, max_connections=WEBHOOK_MAX_CONNECTIONS,
+                 max_body_size=WEBHOOK_MAX_BODY_SIZE, idle_timeout=WEBHOOK_IDLE_TIMEOUT,
+                 reject_linger=WEBHOOK_REJECT_LINGER):
+        self.application = application
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.max_connections = max_connections
+        self.max_body_size = max_body_size
+        self.idle_timeout = idle_timeout
+        self.reject_linger = reject_linger
+        self.connections = 0
+        self.updates_received = 0
+        self.requests_rejected = 0
+        self._started_at = None
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self._started_at = time.time()
+        logging.info("Вебхук принимает обновления на %s:%s%s", self.host, self.port, self.path)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def health(self):
+        """Состояние сервера для /healthz"""
+        processor = self.application.update_processor
+        return {
+            "status": "ok" if self.application.running else "stopping",
+            "uptime": round(time.time() - self._started_at, 1) if self._started_at else 0,
+            "connections": self.connections,
+            "max_connections": self.max_connections,
+            "updates_received": self.updates_received,
+            "requests_rejected": self.requests_rejected,
+            "update_queue": self.application.update_queue.qsize(),
+            "update_processor": processor.stats() if hasattr(processor, "stats") else None,
+        }
+
+    async def _read_request(self, reader):
+        """Чтение одного запроса: (method, path, headers, body) или None, если клиент закрыл соединение"""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.idle_timeout)
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                raise BadRequest()
+            return None
+        except asyncio.LimitOverrunError:
+            raise BadRequest()
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise BadRequest()
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise BadRequest()
+        if length < 0:
+            raise BadRequest()
+        if length > self.max_body_size:
+            raise BadRequest(413)
+        body = await asyncio.wait_for(reader.readexactly(length), self.idle_timeout) if length else b""
+        return method.upper(), target.split("?", 1)[0], headers, body
+
+    async def _dispatch(self, method, path, headers, body):
+        """Обработка запроса: (статус, тело ответа)"""
+        if path == HEALTH_PATH:
+            if method not in ("GET", "HEAD"):
+                return 405, {"error": "method not allowed"}
+            return 200, self.health()
+        if path != self.path:
+            return 404, {"error": "not found"}
+        if method != "POST":
+            return 405, {"error": "method not allowed"}
+        if self.secret_token and not hmac.compare_digest(
+            headers.get("x-telegram-bot-api-secret-token", "").encode(), self.secret_token.encode()
+        ):
+            self.requests_rejected += 1
+            return 403, {"error": "invalid secret token"}
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except (ValueError, TypeError, KeyError):
+            self.requests_rejected += 1
+            return 400, {"error": "invalid update"}
+        if update is None:
+            self.requests_rejected += 1
+            return 400, {"error": "invalid update"}
+        await self.application.update_queue.put(update)
+        self.updates_received += 1
+        return 200, None
+
+    async def _respond(self, writer, status, payload, keep_alive, head_only=False):
+        body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode()
+        headers = [
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+            f"Content-Length: {len(body)}",
+            "Content-Type: application/json",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode() + (b"" if head_only else body))
+        await writer.drain()
+
+    async def _reject_connection(self, reader, writer):
+        """Ответ 503 без чтения запроса и закрытие соединения"""
+        self.requests_rejected += 1
+        try:
+            await self._respond(writer, 503, {"error": "too many connections"}, keep_alive=False)
+            if writer.can_write_eof():
+                writer.write_eof()
+            # Недолго дочитываем присланное клиентом: закрытие сокета с непрочитанными
+            # данными отправляет RST, и клиент может потерять ответ
+            async def discard():
+                while await reader.read(64 * 1024):
+                    pass
+            await asyncio.wait_for(discard(), self.reject_linger)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        writer.close()
+
+    async def _handle_connection(self, reader, writer):
+        if self.connections >= self.max_connections:
+            await self._reject_connection(reader, writer)
+            return
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except BadRequest as e:
+                    await self._respond(writer, e.status, {"error": _REASONS[e.status].lower()}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self._dispatch(method, path, headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive, head_only=method == "HEAD")
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception:
+            logging.exception("Ошибка обработки запроса вебхука")
+        finally:
+            self.connections -= 1
+            writer.close()
+
+
+def derive_secret_token(bot_token):
+    """Секрет вебхука, выведенный из токена бота (HMAC-SHA256 в hex)"""
+    return hmac.new(bot_token.encode(), b"webhook-secret-token", hashlib.sha256).hexdigest()
+
+
+async def serve_webhook(application, server=None):
+    """Работа бота в режиме вебхука до получения SIGINT/SIGTERM"""
+    server = server or WebhookServer(application)
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows: остановка по Ctrl+C через KeyboardInterrupt
+            pass
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    try:
+        if WEBHOOK_URL:
+            if not server.secret_token:
+                # Без секрета обновления на открытый адрес мог бы присылать кто угодно;
+                # секрет из токена совпадает у всех экземпляров, и они не перебивают друг друга
+                server.secret_token = derive_secret_token(application.bot.token)
+                logging.warning("WEBHOOK_SECRET_TOKEN не задан, секрет вебхука выведен из токена бота")
+            await application.bot.set_webhook(
+                url=WEBHOOK_URL.rstrip("/") + server.path,
+                secret_token=server.secret_token,
+                max_connections=server.max_connections,
+                allowed_updates=Update.ALL_TYPES,
+            )
+            logging.info("Вебхук зарегистрирован: %s", WEBHOOK_URL)
+        await application.start()
+        await server.start()
+        try:
+            await stop_event.wait()
+        finally:
+            await server.stop()
+            await application.stop()
+    finally:
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+def run_webhook(application):
+    """Запуск бота в режиме вебхука"""
+    try:
+        asyncio.run(serve_webhook(application))
+    except KeyboardInterrupt:
+        pass